@@ -0,0 +1,159 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+from pymongo.database import Database
+from .config import Config
+from .db import init_db
+from .dispatch import DispatchingBot, ShardedDispatcher
+from .migrations import apply_migrations, current_version, latest_version
+from .state import NoteFlow, PaymentFlow, StateStore, make_store
+from .repositories.settings import SettingsRepository
+from .repositories.users import UsersRepository
+from .repositories.channels import ChannelsRepository
+from .repositories.payments import PaymentsRepository
+from .repositories.schedules import SchedulesRepository
+from .services.archiver import Archiver
+from .services.broadcast import BroadcastEngine
+from .services.counters import CounterBuffer, get_counter_buffer
+from .services.delivery import DeliveryEngine
+from .services.scheduler import QuizScheduler
+
+
+class StartupReport:
+    def __init__(self) -> None:
+        self.phases: List[Tuple[str, float]] = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - t0))
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self._started
+
+    def format(self) -> str:
+        parts = ", ".join(f"{name} {secs * 1000:.0f}ms" for name, secs in self.phases)
+        return f"Startup {self.total * 1000:.0f}ms ({parts})"
+
+
+class App:
+    def __init__(self, db: Database, report: StartupReport, settings_ttl_seconds: float = 30.0) -> None:
+        self.db = db
+        self.report = report
+        self.settings_repo = SettingsRepository(db, ttl_seconds=settings_ttl_seconds)
+        self.users_repo = UsersRepository(db)
+        self.channels_repo = ChannelsRepository(db)
+        self.payments_repo = PaymentsRepository(db)
+        self.schedules_repo = SchedulesRepository(db)
+        self.delivery: DeliveryEngine | None = None
+        self.counters: CounterBuffer | None = None
+        self.scheduler: QuizScheduler | None = None
+        self.broadcasts: BroadcastEngine | None = None
+        self.dispatcher: ShardedDispatcher | None = None
+        self.archiver: Archiver | None = None
+        self.pending_notes: StateStore[NoteFlow] | None = None
+        self.pending_subscriptions: StateStore[PaymentFlow] | None = None
+
+    def shutdown(self) -> None:
+        if self.archiver is not None:
+            self.archiver.shutdown()
+        if self.dispatcher is not None:
+            self.dispatcher.shutdown()
+        if self.broadcasts is not None:
+            self.broadcasts.shutdown()
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+        if self.delivery is not None:
+            self.delivery.shutdown()
+        # Last, so increments from deliveries that just finished are written too
+        if self.counters is not None:
+            self.counters.shutdown()
+
+
+def bootstrap(bot: DispatchingBot, cfg: Config) -> App:
+    """Bring up everything the bot needs before it takes updates.
+
+    Fails fast with RuntimeError instead of starting half-initialized.
+    """
+    report = StartupReport()
+
+    with report.phase("mongo"):
+        _, db = init_db()
+
+    with report.phase("telegram"):
+        try:
+            bot.get_me()
+        except Exception as exc:
+            raise RuntimeError(f"Telegram API check failed: {exc}")
+
+    with report.phase("migrations"):
+        # Only a version lookup on a normal restart; indexes are built on first deploy or upgrade
+        if current_version(db) < latest_version():
+            if not cfg.auto_migrate:
+                raise RuntimeError("Database schema is out of date; run `python -m app.migrations`")
+            apply_migrations(db)
+
+    with report.phase("repositories"):
+        app = App(db, report, cfg.settings_cache_ttl_seconds)
+
+    with report.phase("state"):
+        app.pending_notes = make_store(
+            cfg.state_backend, db, "state_notes", NoteFlow, cfg.state_ttl_seconds, cfg.state_max_entries
+        )
+        app.pending_subscriptions = make_store(
+            cfg.state_backend, db, "state_payments", PaymentFlow, cfg.state_ttl_seconds, cfg.state_max_entries
+        )
+
+    with report.phase("delivery"):
+        app.delivery = DeliveryEngine(bot, workers=cfg.delivery_workers)
+        app.delivery.start()
+        app.counters = get_counter_buffer(db)
+
+    with report.phase("scheduler"):
+        app.scheduler = QuizScheduler(
+            db,
+            bot,
+            app.delivery,
+            concurrency=cfg.scheduler_concurrency,
+            lease_seconds=cfg.schedule_lease_seconds,
+            max_idle_seconds=cfg.scheduler_max_idle_seconds,
+            change_stream=cfg.scheduler_change_stream,
+            pregen_window_seconds=cfg.pregen_window_seconds,
+            pregen_concurrency=cfg.pregen_concurrency,
+            pregen_lease_seconds=cfg.pregen_lease_seconds,
+            streaming=cfg.gemini_streaming,
+            bundle=cfg.bundle_questions,
+        )
+        app.scheduler.start()
+
+    with report.phase("broadcasts"):
+        app.broadcasts = BroadcastEngine(
+            db,
+            bot,
+            batch_size=cfg.broadcast_batch_size,
+            workers=cfg.broadcast_workers,
+            lease_seconds=cfg.broadcast_lease_seconds,
+        )
+        app.broadcasts.start()
+
+    with report.phase("archiver"):
+        app.archiver = Archiver(db, batch_size=cfg.archive_batch_size, interval_seconds=cfg.archive_interval_seconds)
+        app.archiver.start()
+
+    with report.phase("dispatcher"):
+        app.dispatcher = ShardedDispatcher(
+            bot.process_now,
+            shards=cfg.dispatch_shards,
+            queue_size=cfg.dispatch_queue_size,
+            background_workers=cfg.dispatch_background_workers,
+        )
+        app.dispatcher.start()
+        bot.dispatcher = app.dispatcher
+        bot.exception_handler = app.dispatcher.exception_handler
+
+    return app
@@ -1,76 +1,82 @@
-import time
+import logging
+import signal
 from datetime import datetime, timedelta
-from telebot import TeleBot
+from urllib.parse import urlparse
 from telebot.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     CallbackQuery,
+    ChatMemberUpdated,
     Message,
 )
 from bson import ObjectId
 
+from pymongo.database import Database
+
+from .bootstrap import App, bootstrap
 from .config import get_config
-from .db import init_db, get_db
+from .dispatch import DispatchingBot
 from .repositories.settings import SettingsRepository
 from .repositories.users import UsersRepository
 from .repositories.channels import ChannelsRepository
 from .repositories.payments import PaymentsRepository
 from .repositories.schedules import SchedulesRepository
-from .services.gemini import generate_questions
+from .repositories.paging import Page, decode_cursor, encode_cursor
+from .state import NoteFlow, PaymentFlow, StateStore
+from .services.gemini import generate_questions, stream_questions
+from .services.quiz_cache import get_cache
+from .services.membership import on_chat_member_update
+from .services.user_context import UserContext, UserContextMiddleware, user_context
 from .services.quota import (
     has_quota,
     can_submit_note_now,
-    update_last_note_time,
-    reset_notes_if_new_day,
-    increment_quota,
+    admit_note,
+    release_note,
     increase_total_notes,
+    notes_used_today,
 )
-from .services.scheduler import QuizScheduler
-from .utils import is_subscribed, home_keyboard
+from .services.outbound import OutboundLimiter
+from .services.archiver import POLICIES, Archiver
+from .services.broadcast import BroadcastEngine, format_status, parse_broadcast_id
+from .services.delivery import DeliveryEngine, QuizDelivery
+from .services.renderer import home_keyboard, main_menu, render_quiz
+from .utils import is_subscribed
+from .webhook import WebhookServer
 
 
 cfg = get_config()
-# Defer DB connection until runtime; guard when Mongo is unavailable
-try:
-    init_db()
-    db = get_db()
-except Exception:
-    db = None
 
-settings_repo = SettingsRepository(db) if db else None
-users_repo = UsersRepository(db) if db else None
-channels_repo = ChannelsRepository(db) if db else None
-payments_repo = PaymentsRepository(db) if db else None
-schedules_repo = SchedulesRepository(db) if db else None
+# Importing this module only registers handlers; main() connects and starts workers
+db: Database | None = None
+settings_repo: SettingsRepository | None = None
+users_repo: UsersRepository | None = None
+channels_repo: ChannelsRepository | None = None
+payments_repo: PaymentsRepository | None = None
+schedules_repo: SchedulesRepository | None = None
+delivery: DeliveryEngine | None = None
+broadcasts: BroadcastEngine | None = None
+archiver: Archiver | None = None
+
+bot = DispatchingBot(
+    cfg.bot_token,
+    threaded=False,
+    use_class_middlewares=True,
+    limiter=OutboundLimiter(
+        global_per_second=cfg.tg_global_per_second,
+        private_per_second=cfg.tg_private_per_second,
+        group_per_minute=cfg.tg_group_per_minute,
+    ),
+)
 
-bot = TeleBot(cfg.bot_token)
-if db:
-    scheduler = QuizScheduler(db, bot)
-    scheduler.start()
+ALLOWED_UPDATES = ["message", "callback_query", "chat_member"]
 
-pending_notes: dict[int, dict] = {}
-pending_subscriptions: dict[int, dict] = {}
+# Conversation state for the generate and payment flows; backend chosen at startup
+pending_notes: StateStore[NoteFlow] | None = None
+pending_subscriptions: StateStore[PaymentFlow] | None = None
 
 
-def main_menu() -> InlineKeyboardMarkup:
-    kb = InlineKeyboardMarkup()
-    kb.row(
-        InlineKeyboardButton("📝 Generate", callback_data="generate"),
-        InlineKeyboardButton("👤 Profile", callback_data="profile"),
-    )
-    kb.row(
-        InlineKeyboardButton("📢 My Channels", callback_data="channels"),
-        InlineKeyboardButton("⏰ Schedule", callback_data="schedule_menu"),
-    )
-    kb.row(
-        InlineKeyboardButton("ℹ️ About", callback_data="about"),
-        InlineKeyboardButton("🆘 FAQs", callback_data="faq"),
-    )
-    kb.row(
-        InlineKeyboardButton("⚙️ Settings", callback_data="settings"),
-        InlineKeyboardButton("👨‍💻 Developer", url="https://t.me/Bek_i"),
-    )
-    return kb
+def current_user(user_id: int) -> UserContext:
+    return user_context(users_repo, user_id)
 
 
 @bot.message_handler(commands=["start"]) 
@@ -78,7 +84,7 @@ def handle_start(message: Message):
     user_id = message.chat.id
     username = message.from_user.username or "No"
 
-    users_repo.upsert_user(user_id, username)
+    current_user(user_id).replace(users_repo.upsert_user(user_id, username))
 
     if cfg.maintenance_mode:
         bot.send_message(user_id, "The bot is currently under maintenance. Please try again later.")
@@ -105,7 +111,7 @@ def handle_start(message: Message):
 @bot.callback_query_handler(func=lambda call: call.data == "profile")
 def handle_profile(call: CallbackQuery):
     user_id = call.from_user.id
-    user = users_repo.get(user_id)
+    user = current_user(user_id).doc
     if not user:
         bot.answer_callback_query(call.id, "User not found. Press /start")
         return
@@ -121,7 +127,7 @@ def handle_profile(call: CallbackQuery):
         f"<b>Status:</b> {premium_status}\n"
         f"<b>Premium Since:</b> {premium_since_str}\n"
         f"<b>Last Used:</b> {user.get('last_note_time','Never')}\n"
-        f"<b>Notes Today:</b> {user.get('notes_today',0)}\n"
+        f"<b>Notes Today:</b> {notes_used_today(user)}\n"
         f"<b>Total Notes:</b> {user.get('total_notes',0)}\n"
         f"<b>Question Type:</b> {user.get('default_question_type','text').capitalize()}\n"
         f"<b>Questions Per Note:</b> {user.get('questions_per_note',5)}\n"
@@ -130,15 +136,39 @@ def handle_profile(call: CallbackQuery):
     bot.send_message(user_id, text, parse_mode="HTML", reply_markup=home_keyboard())
 
 
+def _page_request(data: str, prefix: str, types: list) -> tuple:
+    # "<prefix>_<n|p>_<cursor>" from a Prev/Next button; anything else means the first page
+    if not data.startswith(prefix + "_"):
+        return None, False
+    direction, _, raw = data[len(prefix) + 1:].partition("_")
+    cursor = decode_cursor(raw, types)
+    return cursor, direction == "p" and cursor is not None
+
+
+def _pager_row(prefix: str, page: Page, fields: list) -> list:
+    buttons = []
+    if page.items and page.has_prev:
+        cursor = encode_cursor([page.items[0][f] for f in fields])
+        buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"{prefix}_p_{cursor}"))
+    if page.items and page.has_next:
+        cursor = encode_cursor([page.items[-1][f] for f in fields])
+        buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"{prefix}_n_{cursor}"))
+    return buttons
+
+
 # Channels Management
-@bot.callback_query_handler(func=lambda call: call.data == "channels")
+@bot.callback_query_handler(func=lambda call: call.data == "channels" or call.data.startswith("chpg_"))
 def handle_channels(call: CallbackQuery):
     user_id = call.from_user.id
-    user_channels = channels_repo.list_channels(user_id)
+    cursor, backward = _page_request(call.data, "chpg", [ObjectId])
+    page = channels_repo.page_channels(user_id, cursor, backward, limit=cfg.menu_page_size)
     kb = InlineKeyboardMarkup(row_width=1)
-    for ch in user_channels:
+    for ch in page.items:
         label = f"{ch.get('title','Channel')} ({ch.get('username') or ch.get('chat_id')})"
         kb.add(InlineKeyboardButton(f"❌ Remove {label}", callback_data=f"removech_{ch['chat_id']}"))
+    nav = _pager_row("chpg", page, ["_id"])
+    if nav:
+        kb.row(*nav)
     kb.add(InlineKeyboardButton("➕ Add a Channel", callback_data="add_channel_info"))
     kb.add(InlineKeyboardButton("🔙 Home", callback_data="home"))
 
@@ -219,22 +249,22 @@ def handle_remove_channel(call: CallbackQuery):
 @bot.callback_query_handler(func=lambda call: call.data == "generate")
 def handle_generate(call: CallbackQuery):
     user_id = call.from_user.id
-    users_repo.reset_notes_if_new_day(user_id)
+    ctx = current_user(user_id)
 
     if not is_subscribed(bot, user_id):
         bot.answer_callback_query(call.id, "Please join required channels first.")
         bot.send_message(user_id, "Please Join All Our Channels!\n/start - To start again")
         return
 
-    if not has_quota(db, user_id):
+    if not has_quota(db, user_id, user=ctx.doc):
         bot.answer_callback_query(call.id, "You have reached your note limit for today.")
         return
 
-    if not can_submit_note_now(db, user_id, cooldown_seconds=10):
+    if not can_submit_note_now(db, user_id, user=ctx.doc):
         bot.answer_callback_query(call.id, "Please wait a few seconds before sending another note.")
         return
 
-    pending_notes[user_id] = {"stage": "await_note"}
+    pending_notes.put(user_id, NoteFlow(stage="await_note"))
     bot.answer_callback_query(call.id)
     bot.send_message(
         user_id,
@@ -243,23 +273,43 @@ def handle_generate(call: CallbackQuery):
     )
 
 
-@bot.message_handler(func=lambda m: m.from_user and m.from_user.id in pending_notes and pending_notes[m.from_user.id].get("stage") == "await_note")
+@bot.message_handler(func=lambda m: m.from_user and pending_notes.stage(m.from_user.id) == "await_note")
 def handle_note_submission(message: Message):
     user_id = message.from_user.id
-    note = message.text or ""
-    pending_notes[user_id]["note"] = note
+    state = pending_notes.get(user_id)
+    if not state:
+        return
+    state.note = message.text or ""
+    state.stage = "choose_destination"
+    pending_notes.put(user_id, state)
+    bot.send_message(user_id, "Choose where to send the quiz:", reply_markup=_destination_keyboard(user_id))
+
 
+def _destination_keyboard(user_id: int, cursor: list | None = None, backward: bool = False) -> InlineKeyboardMarkup:
     # Destination choices: PM or one of user's channels
-    user_channels = channels_repo.list_channels(user_id)
+    page = channels_repo.page_channels(user_id, cursor, backward, limit=cfg.menu_page_size)
     kb = InlineKeyboardMarkup(row_width=1)
     kb.add(InlineKeyboardButton("📥 Send to PM", callback_data="dst_pm"))
-    for ch in user_channels:
+    for ch in page.items:
         label = f"{ch.get('title','Channel')} ({ch.get('username') or ch.get('chat_id')})"
         kb.add(InlineKeyboardButton(f"📣 {label}", callback_data=f"dst_ch_{ch['chat_id']}"))
+    nav = _pager_row("dstpg", page, ["_id"])
+    if nav:
+        kb.row(*nav)
     kb.add(InlineKeyboardButton("🔙 Home", callback_data="home"))
+    return kb
+
 
-    pending_notes[user_id]["stage"] = "choose_destination"
-    bot.send_message(user_id, "Choose where to send the quiz:", reply_markup=kb)
+@bot.callback_query_handler(func=lambda call: call.data.startswith("dstpg_"))
+def handle_destination_page(call: CallbackQuery):
+    user_id = call.from_user.id
+    bot.answer_callback_query(call.id)
+    if pending_notes.stage(user_id) != "choose_destination":
+        return
+    cursor, backward = _page_request(call.data, "dstpg", [ObjectId])
+    bot.edit_message_reply_markup(
+        call.message.chat.id, call.message.message_id, reply_markup=_destination_keyboard(user_id, cursor, backward)
+    )
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("dst_"))
@@ -271,28 +321,29 @@ def handle_destination_selection(call: CallbackQuery):
         return
 
     if call.data == "dst_pm":
-        state["target_chat_id"] = user_id
-        state["target_label"] = "PM"
+        state.target_chat_id = user_id
+        state.target_label = "PM"
     elif call.data.startswith("dst_ch_"):
         chat_id = int(call.data.split("_")[2])
         ch = channels_repo.get_channel(user_id, chat_id)
         if not ch:
             bot.answer_callback_query(call.id, "Channel not found")
             return
-        state["target_chat_id"] = chat_id
-        state["target_label"] = ch.get("title") or str(chat_id)
+        state.target_chat_id = chat_id
+        state.target_label = ch.get("title") or str(chat_id)
     else:
         bot.answer_callback_query(call.id)
         return
 
-    # Ask delay (5-60 seconds)
+    # Ask delay (5-60 seconds, or 0 to send everything at once)
     kb = InlineKeyboardMarkup(row_width=5)
-    for s in [5, 10, 15, 20, 30, 45, 60]:
+    for s in [0, 5, 10, 15, 20, 30, 45, 60]:
         kb.add(InlineKeyboardButton(f"{s}s", callback_data=f"delay_{s}"))
     kb.add(InlineKeyboardButton("Custom", callback_data="delay_custom"))
     kb.add(InlineKeyboardButton("🔙 Home", callback_data="home"))
 
-    state["stage"] = "choose_delay"
+    state.stage = "choose_delay"
+    pending_notes.put(user_id, state)
     bot.answer_callback_query(call.id)
     bot.send_message(user_id, "Choose delay between questions:", reply_markup=kb)
 
@@ -306,14 +357,15 @@ def handle_delay(call: CallbackQuery):
         return
 
     if call.data == "delay_custom":
-        state["stage"] = "await_custom_delay"
+        state.stage = "await_custom_delay"
+        pending_notes.put(user_id, state)
         bot.answer_callback_query(call.id)
-        bot.send_message(user_id, "Send a delay in seconds (5-60):")
+        bot.send_message(user_id, "Send a delay in seconds (0 or 5-60):")
         return
 
     delay = int(call.data.split("_")[1])
-    delay = max(5, min(60, delay))
-    state["delay_seconds"] = delay
+    delay = 0 if delay <= 0 else max(5, min(60, delay))
+    state.delay_seconds = delay
 
     # Ask schedule or send now
     kb = InlineKeyboardMarkup(row_width=2)
@@ -321,12 +373,13 @@ def handle_delay(call: CallbackQuery):
     kb.add(InlineKeyboardButton("Schedule", callback_data="doschedule"))
     kb.add(InlineKeyboardButton("🔙 Home", callback_data="home"))
 
-    state["stage"] = "confirm_send_or_schedule"
+    state.stage = "confirm_send_or_schedule"
+    pending_notes.put(user_id, state)
     bot.answer_callback_query(call.id)
     bot.send_message(user_id, f"Delay set to {delay}s. Send now or schedule?", reply_markup=kb)
 
 
-@bot.message_handler(func=lambda m: m.from_user and m.from_user.id in pending_notes and pending_notes[m.from_user.id].get("stage") == "await_custom_delay")
+@bot.message_handler(func=lambda m: m.from_user and pending_notes.stage(m.from_user.id) == "await_custom_delay")
 def handle_custom_delay(message: Message):
     user_id = message.from_user.id
     state = pending_notes.get(user_id)
@@ -334,11 +387,11 @@ def handle_custom_delay(message: Message):
         return
     try:
         delay = int(message.text.strip())
-        if delay < 5 or delay > 60:
+        if delay != 0 and not 5 <= delay <= 60:
             raise ValueError
-        state["delay_seconds"] = delay
+        state.delay_seconds = delay
     except Exception:
-        bot.reply_to(message, "Invalid delay. Send a number 5-60.")
+        bot.reply_to(message, "Invalid delay. Send 0 or a number 5-60.")
         return
 
     kb = InlineKeyboardMarkup(row_width=2)
@@ -346,8 +399,9 @@ def handle_custom_delay(message: Message):
     kb.add(InlineKeyboardButton("Schedule", callback_data="doschedule"))
     kb.add(InlineKeyboardButton("🔙 Home", callback_data="home"))
 
-    state["stage"] = "confirm_send_or_schedule"
-    bot.send_message(user_id, f"Delay set to {state['delay_seconds']}s. Send now or schedule?", reply_markup=kb)
+    state.stage = "confirm_send_or_schedule"
+    pending_notes.put(user_id, state)
+    bot.send_message(user_id, f"Delay set to {state.delay_seconds}s. Send now or schedule?", reply_markup=kb)
 
 
 @bot.callback_query_handler(func=lambda call: call.data == "sendnow")
@@ -358,61 +412,81 @@ def send_now(call: CallbackQuery):
         bot.answer_callback_query(call.id)
         return
 
-    note = state.get("note", "")
-    target = state.get("target_chat_id", user_id)
-    delay = int(state.get("delay_seconds", 5))
+    note = state.note or ""
+    target = state.target_chat_id or user_id
+    delay = int(state.delay_seconds if state.delay_seconds is not None else 5)
 
-    user = users_repo.get(user_id) or {}
+    ctx = current_user(user_id)
+    user = ctx.doc
     num_questions = int(user.get("questions_per_note", 5))
     q_format = (user.get("default_question_type") or cfg.question_type_default).lower()
 
-    if not has_quota(db, user_id):
-        bot.answer_callback_query(call.id, "Daily quota reached")
+    admitted = admit_note(db, user_id)
+    if not admitted:
+        if not has_quota(db, user_id, user=user):
+            bot.answer_callback_query(call.id, "Daily quota reached")
+        else:
+            bot.answer_callback_query(call.id, "Wait a few seconds before next note")
         return
-
-    if not can_submit_note_now(db, user_id, cooldown_seconds=10):
-        bot.answer_callback_query(call.id, "Wait a few seconds before next note")
-        return
-
-    update_last_note_time(db, user_id)
+    ctx.replace(admitted)
+    day = admitted["notes_day"]
     bot.answer_callback_query(call.id)
+    pending_notes.pop(user_id)
 
     generating = bot.send_message(user_id, "Generating...")
+    fresh = bool(user.get("fresh_questions"))
+    # Generation takes seconds; keep this user's shard free for everyone else on it
+    bot.offload(_generate_and_deliver, user_id, note, target, delay, num_questions, q_format, fresh, day, generating.id)
+
+
+def _generate_and_deliver(
+    user_id: int,
+    note: str,
+    target: int,
+    delay: int,
+    num_questions: int,
+    q_format: str,
+    fresh: bool,
+    day: str,
+    generating_id: int,
+) -> None:
+    job = None
+    error: Exception | None = None
     try:
-        questions = generate_questions(note, num_questions)
-        if not questions:
+        if cfg.gemini_streaming:
+            questions = stream_questions(note, num_questions, fresh=fresh)
+        else:
+            questions = generate_questions(note, num_questions, fresh=fresh)
+        # With streaming, question 1 is queued while later ones are still being generated
+        for item in render_quiz(questions, q_format, bundle=cfg.bundle_questions and delay == 0):
+            if job is None:
+                bot.delete_message(user_id, generating_id)
+                job = delivery.open(target, delay, on_done=lambda done: _on_quiz_delivered(user_id, day, done))
+            delivery.feed(job, item)
+        if job is None:
+            release_note(db, user_id, day)
             bot.send_message(user_id, "An error occurred while generating questions. Please try again.")
             return
-        bot.delete_message(user_id, generating.id)
-        letters = ["A", "B", "C", "D"]
-        for idx, q in enumerate(questions, start=1):
-            time.sleep(delay)
-            if q_format == "text":
-                text = f"{idx}. {q['question']}\n"
-                for i, c in enumerate(q["choices"]):
-                    prefix = letters[i] if i < len(letters) else str(i + 1)
-                    text += f"{prefix}. {c}\n"
-                text += f"\n<b>Correct Answer</b>: {letters[q['answer_index']]} - {q['choices'][q['answer_index']]}"
-                explanation = (q.get("explanation") or "")
-                if explanation:
-                    text += f"\n<b>Explanation:</b> {explanation[:195]}"
-                bot.send_message(target, text, parse_mode="HTML")
-            else:
-                bot.send_poll(
-                    target,
-                    q["question"],
-                    q["choices"],
-                    type="quiz",
-                    correct_option_id=q["answer_index"],
-                    explanation=(q.get("explanation") or "")[:195],
-                )
-        increment_quota(db, user_id)
-        increase_total_notes(db, user_id)
-        bot.send_message(user_id, "✅ Questions generated successfully.", reply_markup=home_keyboard())
     except Exception as e:
+        if job is not None:
+            # Reported by _on_quiz_delivered once the questions already queued are sent
+            error = e
+            return
+        release_note(db, user_id, day)
         bot.send_message(user_id, f"Something went wrong: {e}")
     finally:
-        pending_notes.pop(user_id, None)
+        if job is not None:
+            delivery.close(job, error)
+
+
+def _on_quiz_delivered(user_id: int, day: str, job: QuizDelivery) -> None:
+    if job.error is not None:
+        if job.sent == 0:
+            release_note(db, user_id, day)
+        bot.send_message(user_id, f"Something went wrong: {job.error}")
+        return
+    increase_total_notes(db, user_id)
+    bot.send_message(user_id, "✅ Questions generated successfully.", reply_markup=home_keyboard())
 
 
 @bot.callback_query_handler(func=lambda call: call.data == "doschedule")
@@ -422,12 +496,13 @@ def do_schedule(call: CallbackQuery):
     if not state:
         bot.answer_callback_query(call.id)
         return
-    state["stage"] = "await_schedule_time"
+    state.stage = "await_schedule_time"
+    pending_notes.put(user_id, state)
     bot.answer_callback_query(call.id)
     bot.send_message(user_id, "Send schedule time in format YYYY-MM-DD HH:MM (UTC). Example: 2025-01-01 12:30")
 
 
-@bot.message_handler(func=lambda m: m.from_user and m.from_user.id in pending_notes and pending_notes[m.from_user.id].get("stage") == "await_schedule_time")
+@bot.message_handler(func=lambda m: m.from_user and pending_notes.stage(m.from_user.id) == "await_schedule_time")
 def handle_schedule_time(message: Message):
     user_id = message.from_user.id
     state = pending_notes.get(user_id)
@@ -440,25 +515,26 @@ def handle_schedule_time(message: Message):
         return
 
     # Save schedule
-    user = users_repo.get(user_id) or {}
+    user = current_user(user_id).doc
     num_questions = int(user.get("questions_per_note", 5))
     q_format = (user.get("default_question_type") or cfg.question_type_default).lower()
 
     schedules_repo.create(
         {
             "user_id": user_id,
-            "target_chat_id": state.get("target_chat_id", user_id),
-            "target_label": state.get("target_label", "PM"),
-            "note": state.get("note", ""),
+            "target_chat_id": state.target_chat_id or user_id,
+            "target_label": state.target_label or "PM",
+            "note": state.note or "",
             "num_questions": num_questions,
             "question_type": q_format,
-            "delay_seconds": int(state.get("delay_seconds", 5)),
+            "delay_seconds": int(state.delay_seconds if state.delay_seconds is not None else 5),
+            "fresh": bool(user.get("fresh_questions")),
             "scheduled_at": dt,
             "status": "pending",
             "created_at": datetime.utcnow(),
         }
     )
-    pending_notes.pop(user_id, None)
+    pending_notes.pop(user_id)
     bot.send_message(user_id, "📅 Scheduled successfully.", reply_markup=home_keyboard())
 
 
@@ -466,19 +542,24 @@ def handle_schedule_time(message: Message):
 @bot.callback_query_handler(func=lambda call: call.data == "settings")
 def handle_settings(call: CallbackQuery):
     user_id = call.from_user.id
-    user = users_repo.get(user_id)
+    user = current_user(user_id).doc
     if not user:
         bot.answer_callback_query(call.id, "User not found.")
         return
 
     question_type = user.get("default_question_type", "text")
     questions_per_note = user.get("questions_per_note", 5)
-    msg = f"**Settings**\n• Question Type: `{question_type}`\n• Questions per Note: `{questions_per_note}`"
+    fresh = "on" if user.get("fresh_questions") else "off"
+    msg = (
+        f"**Settings**\n• Question Type: `{question_type}`\n• Questions per Note: `{questions_per_note}`"
+        f"\n• Always Fresh Questions: `{fresh}`"
+    )
 
     markup = InlineKeyboardMarkup(row_width=1)
     markup.add(
         InlineKeyboardButton("Change Question Type", callback_data="change_qtype"),
         InlineKeyboardButton("Change Questions/Note", callback_data="change_qpernote"),
+        InlineKeyboardButton("Toggle Fresh Questions", callback_data="toggle_fresh"),
         InlineKeyboardButton("Back to Home", callback_data="home"),
     )
 
@@ -506,7 +587,7 @@ def change_question_type(call: CallbackQuery):
 def set_question_type(call: CallbackQuery):
     user_id = call.from_user.id
     new_type = call.data.split("_")[-1]
-    users_repo.set_default_qtype(user_id, new_type)
+    current_user(user_id).set("default_question_type", new_type)
     bot.answer_callback_query(call.id, f"Question type updated to {new_type.capitalize()}")
     handle_settings(call)
 
@@ -532,15 +613,25 @@ def set_questions_per_note(call: CallbackQuery):
     if new_value > max_limit:
         bot.answer_callback_query(call.id, f"Limit is {max_limit} for your plan.")
         return
-    users_repo.set_questions_per_note(user_id, new_value)
+    current_user(user_id).set("questions_per_note", new_value)
     bot.answer_callback_query(call.id, f"Updated to {new_value} questions per note.")
     handle_settings(call)
 
 
+@bot.callback_query_handler(func=lambda call: call.data == "toggle_fresh")
+def toggle_fresh_questions(call: CallbackQuery):
+    user_id = call.from_user.id
+    ctx = current_user(user_id)
+    new_value = not ctx.get("fresh_questions", False)
+    ctx.set("fresh_questions", new_value)
+    bot.answer_callback_query(call.id, "Fresh questions " + ("on" if new_value else "off"))
+    handle_settings(call)
+
+
 @bot.callback_query_handler(func=lambda call: call.data == "home")
 def handle_home(call: CallbackQuery):
     user_id = call.from_user.id
-    pending_notes.pop(user_id, None)
+    pending_notes.pop(user_id)
     handle_start(call.message)
 
 
@@ -602,7 +693,7 @@ def subscribe_premium_start(call: CallbackQuery):
 def choose_payment_method(call: CallbackQuery):
     user_id = call.from_user.id
     method = call.data.split("_")[1]
-    pending_subscriptions[user_id] = {"method": method}
+    pending_subscriptions.put(user_id, PaymentFlow(method=method))
 
     if method == "telebirr":
         numbers = (settings_repo.get("telebirr_numbers", cfg.telebirr_numbers) if settings_repo else cfg.telebirr_numbers)
@@ -621,9 +712,11 @@ def choose_payment_method(call: CallbackQuery):
 @bot.message_handler(content_types=["photo"]) 
 def handle_payment_photo(message: Message):
     user_id = message.from_user.id
-    if user_id not in pending_subscriptions:
+    info = pending_subscriptions.get(user_id)
+    if not info:
         return
-    pending_subscriptions[user_id]["screenshot"] = message.photo[-1].file_id
+    info.screenshot = message.photo[-1].file_id
+    pending_subscriptions.put(user_id, info)
     kb = InlineKeyboardMarkup()
     kb.row(InlineKeyboardButton("Done", callback_data="confirm_payment"), InlineKeyboardButton("Cancel", callback_data="cancel_payment"))
     bot.send_message(user_id, "Submit this payment?", reply_markup=kb)
@@ -632,7 +725,7 @@ def handle_payment_photo(message: Message):
 @bot.callback_query_handler(func=lambda call: call.data == "cancel_payment")
 def cancel_payment(call: CallbackQuery):
     user_id = call.from_user.id
-    pending_subscriptions.pop(user_id, None)
+    pending_subscriptions.pop(user_id)
     bot.delete_message(call.message.chat.id, call.message.message_id)
     bot.send_message(user_id, "Payment process canceled.", reply_markup=home_keyboard())
 
@@ -644,8 +737,8 @@ def confirm_payment(call: CallbackQuery):
     if not info:
         return
 
-    method = info["method"]
-    screenshot_id = info.get("screenshot")
+    method = info.method
+    screenshot_id = info.screenshot
     if not screenshot_id:
         bot.send_message(user_id, "Please send a photo of your payment.")
         return
@@ -654,7 +747,7 @@ def confirm_payment(call: CallbackQuery):
     payments_repo.insert(user_id, method, amount, screenshot_id)
 
     # Notify admins: for demo, anyone with role admin in DB
-    admins = [u.get("id") for u in db["users"].find({"role": "admin"})]
+    admins = users_repo.list_admin_ids()
     for admin_id in admins:
         kb = InlineKeyboardMarkup()
         kb.row(
@@ -668,14 +761,13 @@ def confirm_payment(call: CallbackQuery):
         bot.send_photo(admin_id, screenshot_id, caption=f"New Payment\nUser: {user_id}\nMethod: {method}\nAmount: {amount}", reply_markup=kb)
 
     bot.send_message(user_id, "Payment submitted for review. You'll be notified soon.", reply_markup=home_keyboard())
-    pending_subscriptions.pop(user_id, None)
+    pending_subscriptions.pop(user_id)
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("acceptpay_"))
 def accept_payment(call: CallbackQuery):
     # Only admins should accept
-    admin_user = users_repo.get(call.from_user.id)
-    if (admin_user or {}).get("role") != "admin":
+    if not current_user(call.from_user.id).is_admin:
         return
     user_id = int(call.data.split("_")[1])
     users_repo.set_premium(user_id, 30)
@@ -693,32 +785,50 @@ def accept_payment(call: CallbackQuery):
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("declinepay_"))
 def decline_payment(call: CallbackQuery):
-    admin_user = users_repo.get(call.from_user.id)
-    if (admin_user or {}).get("role") != "admin":
+    if not current_user(call.from_user.id).is_admin:
         return
     user_id = int(call.data.split("_")[1])
     payments_repo.update_status(user_id, "declined")
     bot.send_message(user_id, "Your premium request was declined. If this is a mistake, please try again.")
 
 
+# Keeps the force-subscription cache in step with joins/leaves (bot must be admin there)
+@bot.chat_member_handler()
+def handle_chat_member(update: ChatMemberUpdated):
+    member = update.new_chat_member
+    on_chat_member_update(member.user.id, update.chat.id, update.chat.username, member.status)
+
+
 # FAQ/About handlers already added
 
-@bot.callback_query_handler(func=lambda call: call.data == "schedule_menu")
+@bot.callback_query_handler(func=lambda call: call.data == "schedule_menu" or call.data.startswith("schpg_"))
 def handle_schedule_menu(call: CallbackQuery):
+    bot.answer_callback_query(call.id)
+    _show_schedule_menu(call)
+
+
+def _show_schedule_menu(call: CallbackQuery) -> None:
+    # Renders only; each callback handler answers its own call exactly once
     user_id = call.from_user.id
-    items = schedules_repo.get_user_schedules(user_id)
-    if not items:
+    cursor, backward = _page_request(call.data, "schpg", [datetime, ObjectId])
+    page = schedules_repo.page_user_schedules(user_id, cursor, backward, limit=cfg.menu_page_size)
+    if not page.items and cursor is not None:
+        # Everything past the cursor was deleted; start over
+        page = schedules_repo.page_user_schedules(user_id, limit=cfg.menu_page_size)
+    if not page.items:
         kb = InlineKeyboardMarkup()
         kb.add(InlineKeyboardButton("🔙 Home", callback_data="home"))
-        bot.answer_callback_query(call.id)
         bot.send_message(user_id, "No schedules yet. Use Generate → pick destination → Schedule.", reply_markup=kb)
         return
     kb = InlineKeyboardMarkup(row_width=1)
-    for s in items:
+    for s in page.items:
         sched_id = str(s.get("_id"))
         when = s.get("scheduled_at")
         label = f"{s.get('target_label','PM')} @ {when} ({s.get('status','pending')})"
         kb.add(InlineKeyboardButton(f"❌ Delete {label}", callback_data=f"delsch_{sched_id}"))
+    nav = _pager_row("schpg", page, ["scheduled_at", "_id"])
+    if nav:
+        kb.row(*nav)
     kb.add(InlineKeyboardButton("🔙 Home", callback_data="home"))
     try:
         bot.edit_message_text("Your schedules:", call.message.chat.id, call.message.message_id, reply_markup=kb)
@@ -732,12 +842,7 @@ def handle_delete_schedule(call: CallbackQuery):
     sched_id = call.data.split("_")[1]
     ok = schedules_repo.delete(user_id, sched_id)
     bot.answer_callback_query(call.id, "Deleted" if ok else "Not found")
-    handle_schedule_menu(call)
-
-
-print("Bot running...")
-if __name__ == "__main__":
-    bot.infinity_polling()
+    _show_schedule_menu(call)
 
 
 @bot.message_handler(commands=["setforcesub"]) 
@@ -745,8 +850,7 @@ def admin_set_force_subscription(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     parts = message.text.strip().split()
@@ -754,7 +858,7 @@ def admin_set_force_subscription(message: Message):
         bot.reply_to(message, "Usage: /setforcesub on|off")
         return
     val = parts[1].lower() in ("on", "true", "1", "yes")
-    SettingsRepository(db).set("force_subscription", val)
+    settings_repo.set("force_subscription", val)
     bot.reply_to(message, f"force_subscription set to {val}")
 
 
@@ -763,8 +867,7 @@ def admin_set_force_channels(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     # Example: /setforcechannels @Ch1 @Ch2 @Ch3
@@ -773,7 +876,7 @@ def admin_set_force_channels(message: Message):
     if not channels:
         bot.reply_to(message, "Usage: /setforcechannels @Ch1 @Ch2 ...")
         return
-    SettingsRepository(db).set("force_channels", channels)
+    settings_repo.set("force_channels", channels)
     bot.reply_to(message, f"force_channels updated: {', '.join(channels)}")
 
 
@@ -782,8 +885,7 @@ def admin_set_premium_price(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     parts = message.text.strip().split()
@@ -791,7 +893,7 @@ def admin_set_premium_price(message: Message):
         bot.reply_to(message, "Usage: /setpremiumprice 40")
         return
     price = int(parts[1])
-    SettingsRepository(db).set("premium_price", price)
+    settings_repo.set("premium_price", price)
     bot.reply_to(message, f"premium_price set to {price}")
 
 
@@ -800,15 +902,14 @@ def admin_set_payment_channel(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     parts = message.text.strip().split()
     if len(parts) < 2 or not parts[1].startswith("@"):
         bot.reply_to(message, "Usage: /setpaymentchannel @PaymentsChannel")
         return
-    SettingsRepository(db).set("payment_channel", parts[1])
+    settings_repo.set("payment_channel", parts[1])
     bot.reply_to(message, f"payment_channel set to {parts[1]}")
 
 
@@ -817,18 +918,17 @@ def admin_add_telebirr(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     parts = message.text.strip().split()
     if len(parts) < 2:
         bot.reply_to(message, "Usage: /addtelebirr 0912345678")
         return
-    current = SettingsRepository(db).get("telebirr_numbers", [])
+    current = settings_repo.get("telebirr_numbers", [])
     if parts[1] not in current:
         current.append(parts[1])
-    SettingsRepository(db).set("telebirr_numbers", current)
+    settings_repo.set("telebirr_numbers", current)
     bot.reply_to(message, f"telebirr_numbers: {', '.join(current)}")
 
 
@@ -837,18 +937,17 @@ def admin_add_cbe(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     parts = message.text.strip().split()
     if len(parts) < 2:
         bot.reply_to(message, "Usage: /addcbe 1000123456")
         return
-    current = SettingsRepository(db).get("cbe_numbers", [])
+    current = settings_repo.get("cbe_numbers", [])
     if parts[1] not in current:
         current.append(parts[1])
-    SettingsRepository(db).set("cbe_numbers", current)
+    settings_repo.set("cbe_numbers", current)
     bot.reply_to(message, f"cbe_numbers: {', '.join(current)}")
 
 
@@ -857,8 +956,7 @@ def admin_set_max_notes(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     # Usage: /setmaxnotes regular 5  OR  /setmaxnotes premium 10
@@ -867,7 +965,7 @@ def admin_set_max_notes(message: Message):
         bot.reply_to(message, "Usage: /setmaxnotes regular|premium <num>")
         return
     key = f"max_notes_{parts[1]}"
-    SettingsRepository(db).set(key, int(parts[2]))
+    settings_repo.set(key, int(parts[2]))
     bot.reply_to(message, f"{key} set to {parts[2]}")
 
 
@@ -876,8 +974,7 @@ def admin_set_max_questions(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     # Usage: /setmaxquestions regular 5  OR  /setmaxquestions premium 10
@@ -886,7 +983,7 @@ def admin_set_max_questions(message: Message):
         bot.reply_to(message, "Usage: /setmaxquestions regular|premium <num>")
         return
     key = f"max_questions_{parts[1]}"
-    SettingsRepository(db).set(key, int(parts[2]))
+    settings_repo.set(key, int(parts[2]))
     bot.reply_to(message, f"{key} set to {parts[2]}")
 
 
@@ -895,8 +992,7 @@ def admin_maintenance_mode(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    admin = users_repo.get(message.from_user.id)
-    if not admin or admin.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     parts = message.text.strip().split()
@@ -904,7 +1000,7 @@ def admin_maintenance_mode(message: Message):
         bot.reply_to(message, "Usage: /maintenancemode on|off")
         return
     val = parts[1].lower() in ("on", "true", "1", "yes")
-    SettingsRepository(db).set("maintenance_mode", val)
+    settings_repo.set("maintenance_mode", val)
     bot.reply_to(message, f"maintenance_mode set to {val}")
 
 
@@ -913,8 +1009,7 @@ def admin_add_admin(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    req = users_repo.get(message.from_user.id)
-    if not req or req.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     parts = message.text.strip().split()
@@ -931,8 +1026,7 @@ def admin_remove_admin(message: Message):
     if not users_repo:
         bot.reply_to(message, "DB unavailable.")
         return
-    req = users_repo.get(message.from_user.id)
-    if not req or req.get("role") != "admin":
+    if not current_user(message.from_user.id).is_admin:
         bot.reply_to(message, "Not authorized.")
         return
     parts = message.text.strip().split()
@@ -941,4 +1035,226 @@ def admin_remove_admin(message: Message):
         return
     target_id = int(parts[1])
     users_repo.set_role(target_id, "user")
-    bot.reply_to(message, f"User {target_id} demoted from admin.")
\ No newline at end of file
+    bot.reply_to(message, f"User {target_id} demoted from admin.")
+
+
+@bot.message_handler(commands=["cachestats"]) 
+def admin_cache_stats(message: Message):
+    if not users_repo:
+        bot.reply_to(message, "DB unavailable.")
+        return
+    if not current_user(message.from_user.id).is_admin:
+        bot.reply_to(message, "Not authorized.")
+        return
+    stats = get_cache().stats()
+    lookups = stats["hits"] + stats["db_hits"] + stats["misses"]
+    rate = (stats["hits"] + stats["db_hits"]) * 100 // lookups if lookups else 0
+    bot.reply_to(
+        message,
+        f"Quiz cache: {stats['entries']} in memory\n"
+        f"Memory hits: {stats['hits']}\nDB hits: {stats['db_hits']}\nMisses: {stats['misses']}\nHit rate: {rate}%",
+    )
+
+
+@bot.message_handler(commands=["queuestats"]) 
+def admin_queue_stats(message: Message):
+    if not users_repo:
+        bot.reply_to(message, "DB unavailable.")
+        return
+    if not current_user(message.from_user.id).is_admin:
+        bot.reply_to(message, "Not authorized.")
+        return
+    stats = bot.dispatcher.stats()
+    bot.reply_to(
+        message,
+        f"Update shards: {stats['shards']}\nQueued: {stats['queued']}\n"
+        f"Deepest shard: #{stats['busiest']} ({stats['max_depth']})\n"
+        f"Processed: {stats['processed']} ({stats['failed']} failed)\n"
+        f"Quiz deliveries waiting: {delivery.in_flight()}",
+    )
+
+
+@bot.message_handler(commands=["setretention"]) 
+def admin_set_retention(message: Message):
+    if not users_repo:
+        bot.reply_to(message, "DB unavailable.")
+        return
+    if not current_user(message.from_user.id).is_admin:
+        bot.reply_to(message, "Not authorized.")
+        return
+    parts = message.text.strip().split()
+    if len(parts) < 3 or parts[1] not in POLICIES or not parts[2].isdigit():
+        bot.reply_to(message, "Usage: /setretention schedules|payments <days> (0 keeps forever)")
+        return
+    key = POLICIES[parts[1]][0]
+    settings_repo.set(key, int(parts[2]))
+    bot.reply_to(message, f"{key} set to {parts[2]}")
+
+
+@bot.message_handler(commands=["archivereport"]) 
+def admin_archive_report(message: Message):
+    if not users_repo:
+        bot.reply_to(message, "DB unavailable.")
+        return
+    if not current_user(message.from_user.id).is_admin:
+        bot.reply_to(message, "Not authorized.")
+        return
+    lines = []
+    for source in POLICIES:
+        totals = archiver.repo.totals(source)
+        lines.append(
+            f"{source}: keep {archiver.retention_days(source)} days, "
+            f"{totals['docs']} archived in {totals['batches']} batches"
+        )
+    last = archiver.repo.last_run()
+    if last:
+        moved = ", ".join(f"{k} {v}" for k, v in last.get("moved", {}).items())
+        lines.append(f"Last run: {last['started_at']:%Y-%m-%d %H:%M} UTC ({moved})")
+        if last.get("error"):
+            lines.append(f"Last run failed: {last['error']}")
+    else:
+        lines.append("Last run: never")
+    bot.reply_to(message, "\n".join(lines))
+
+
+@bot.message_handler(commands=["broadcast"]) 
+def admin_broadcast(message: Message):
+    if not users_repo:
+        bot.reply_to(message, "DB unavailable.")
+        return
+    if not current_user(message.from_user.id).is_admin:
+        bot.reply_to(message, "Not authorized.")
+        return
+    parts = message.text.split(maxsplit=1)
+    if len(parts) < 2 or not parts[1].strip():
+        bot.reply_to(message, "Usage: /broadcast <message>")
+        return
+    broadcast_id = broadcasts.create(parts[1].strip(), message.from_user.id)
+    bot.reply_to(message, f"Broadcast {broadcast_id} started.\n/broadcaststatus - progress\n/pausebroadcast - pause")
+
+
+def _broadcast_from_args(message: Message) -> dict | None:
+    # Optional id argument; defaults to the most recent broadcast
+    parts = message.text.strip().split()
+    if len(parts) > 1:
+        broadcast_id = parse_broadcast_id(parts[1])
+        return broadcasts.repo.get(broadcast_id) if broadcast_id else None
+    return broadcasts.repo.latest()
+
+
+@bot.message_handler(commands=["broadcaststatus"]) 
+def admin_broadcast_status(message: Message):
+    if not users_repo:
+        bot.reply_to(message, "DB unavailable.")
+        return
+    if not current_user(message.from_user.id).is_admin:
+        bot.reply_to(message, "Not authorized.")
+        return
+    doc = _broadcast_from_args(message)
+    if not doc:
+        bot.reply_to(message, "No broadcast found.")
+        return
+    bot.reply_to(message, format_status(doc))
+
+
+@bot.message_handler(commands=["pausebroadcast"]) 
+def admin_pause_broadcast(message: Message):
+    if not users_repo:
+        bot.reply_to(message, "DB unavailable.")
+        return
+    if not current_user(message.from_user.id).is_admin:
+        bot.reply_to(message, "Not authorized.")
+        return
+    doc = _broadcast_from_args(message)
+    if not doc or doc["status"] != "running":
+        bot.reply_to(message, "No running broadcast found.")
+        return
+    broadcasts.pause(doc["_id"])
+    bot.reply_to(message, f"Broadcast {doc['_id']} paused.")
+
+
+@bot.message_handler(commands=["resumebroadcast"]) 
+def admin_resume_broadcast(message: Message):
+    if not users_repo:
+        bot.reply_to(message, "DB unavailable.")
+        return
+    if not current_user(message.from_user.id).is_admin:
+        bot.reply_to(message, "Not authorized.")
+        return
+    doc = _broadcast_from_args(message)
+    if not doc or doc["status"] not in ("paused", "failed"):
+        bot.reply_to(message, "No paused or failed broadcast found.")
+        return
+    broadcasts.resume(doc["_id"])
+    bot.reply_to(message, f"Broadcast {doc['_id']} resumed.")
+
+
+def _bind(app: App) -> None:
+    global db, settings_repo, users_repo, channels_repo, payments_repo, schedules_repo, delivery, broadcasts
+    global pending_notes, pending_subscriptions, archiver
+    db = app.db
+    settings_repo = app.settings_repo
+    users_repo = app.users_repo
+    channels_repo = app.channels_repo
+    payments_repo = app.payments_repo
+    schedules_repo = app.schedules_repo
+    delivery = app.delivery
+    broadcasts = app.broadcasts
+    archiver = app.archiver
+    pending_notes = app.pending_notes
+    pending_subscriptions = app.pending_subscriptions
+    bot.setup_middleware(UserContextMiddleware(users_repo))
+
+
+def _serve_webhook() -> None:
+    if not cfg.webhook_url or not cfg.webhook_secret:
+        raise SystemExit("WEBHOOK_URL and WEBHOOK_SECRET are required when UPDATE_MODE=webhook")
+    server = WebhookServer(
+        bot,
+        host=cfg.webhook_host,
+        port=cfg.webhook_port,
+        path=urlparse(cfg.webhook_url).path,
+        secret=cfg.webhook_secret,
+        workers=cfg.webhook_workers,
+        queue_size=cfg.webhook_queue_size,
+    )
+    bot.set_webhook(
+        url=cfg.webhook_url,
+        secret_token=cfg.webhook_secret,
+        allowed_updates=ALLOWED_UPDATES,
+    )
+    print(f"Bot running (webhook on {cfg.webhook_host}:{cfg.webhook_port})...")
+    try:
+        server.serve_forever()
+    finally:
+        server.shutdown()
+
+
+def _on_sigterm(signum, frame) -> None:
+    # docker stop and rolling deploys send SIGTERM; leave through main()'s finally so
+    # app.shutdown() runs and buffered counters are flushed
+    bot.stop_polling()
+    raise SystemExit(0)
+
+
+def main() -> None:
+    try:
+        app = bootstrap(bot, cfg)
+    except RuntimeError as exc:
+        raise SystemExit(f"Startup failed: {exc}")
+    _bind(app)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print(app.report.format())
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    try:
+        if cfg.update_mode == "webhook":
+            _serve_webhook()
+        else:
+            print("Bot running...")
+            bot.infinity_polling(allowed_updates=ALLOWED_UPDATES)
+    finally:
+        app.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,24 +14,83 @@ class Config(BaseModel):
     bot_token: str = Field(default_factory=lambda: os.getenv("BOT_TOKEN", ""))
     mongo_uri: str = Field(default_factory=lambda: os.getenv("MONGO_URI", "mongodb://localhost:27017"))
     mongo_db: str = Field(default_factory=lambda: os.getenv("MONGO_DB", "quizbot"))
+    mongo_timeout_ms: int = Field(default_factory=lambda: int(os.getenv("MONGO_TIMEOUT_MS", "3000")))
+    auto_migrate: bool = Field(default_factory=lambda: os.getenv("AUTO_MIGRATE", "true").lower() == "true")
+    update_mode: str = Field(default_factory=lambda: os.getenv("UPDATE_MODE", "polling").lower())
+    webhook_url: str = Field(default_factory=lambda: os.getenv("WEBHOOK_URL", ""))
+    webhook_secret: str = Field(default_factory=lambda: os.getenv("WEBHOOK_SECRET", ""))
+    webhook_host: str = Field(default_factory=lambda: os.getenv("WEBHOOK_HOST", "0.0.0.0"))
+    webhook_port: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_PORT", "8080")))
+    webhook_workers: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_WORKERS", "8")))
+    webhook_queue_size: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000")))
+    dispatch_shards: int = Field(default_factory=lambda: int(os.getenv("DISPATCH_SHARDS", "16")))
+    dispatch_queue_size: int = Field(default_factory=lambda: int(os.getenv("DISPATCH_QUEUE_SIZE", "100")))
+    dispatch_background_workers: int = Field(default_factory=lambda: int(os.getenv("DISPATCH_BACKGROUND_WORKERS", "16")))
+    state_backend: str = Field(default_factory=lambda: os.getenv("STATE_BACKEND", "memory").lower())
+    state_ttl_seconds: float = Field(default_factory=lambda: float(os.getenv("STATE_TTL_SECONDS", "3600")))
+    state_max_entries: int = Field(default_factory=lambda: int(os.getenv("STATE_MAX_ENTRIES", "10000")))
+    bundle_questions: bool = Field(default_factory=lambda: os.getenv("BUNDLE_QUESTIONS", "true").lower() == "true")
+    menu_page_size: int = Field(default_factory=lambda: int(os.getenv("MENU_PAGE_SIZE", "8")))
+    retention_days_schedules: int = Field(default_factory=lambda: int(os.getenv("RETENTION_DAYS_SCHEDULES", "30")))
+    retention_days_payments: int = Field(default_factory=lambda: int(os.getenv("RETENTION_DAYS_PAYMENTS", "180")))
+    archive_batch_size: int = Field(default_factory=lambda: int(os.getenv("ARCHIVE_BATCH_SIZE", "500")))
+    archive_interval_seconds: float = Field(default_factory=lambda: float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600")))
     gemini_api_key: str = Field(default_factory=lambda: os.getenv("GEMINI_API_KEY", ""))
+    gemini_api_url: str = Field(default_factory=lambda: os.getenv("GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta"))
+    gemini_model: str = Field(default_factory=lambda: os.getenv("GEMINI_MODEL", "gemini-2.0-flash"))
+    gemini_connect_timeout: float = Field(default_factory=lambda: float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5")))
+    gemini_read_timeout: float = Field(default_factory=lambda: float(os.getenv("GEMINI_READ_TIMEOUT", "60")))
+    gemini_max_retries: int = Field(default_factory=lambda: int(os.getenv("GEMINI_MAX_RETRIES", "3")))
+    gemini_max_concurrency: int = Field(default_factory=lambda: int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")))
+    gemini_pool_size: int = Field(default_factory=lambda: int(os.getenv("GEMINI_POOL_SIZE", "16")))
+    gemini_chunk_chars: int = Field(default_factory=lambda: int(os.getenv("GEMINI_CHUNK_CHARS", "2000")))
+    gemini_streaming: bool = Field(default_factory=lambda: os.getenv("GEMINI_STREAMING", "true").lower() == "true")
+    gemini_batch_window_ms: int = Field(default_factory=lambda: int(os.getenv("GEMINI_BATCH_WINDOW_MS", "200")))
+    gemini_batch_max: int = Field(default_factory=lambda: int(os.getenv("GEMINI_BATCH_MAX", "5")))
 
     force_subscription: bool = Field(default_factory=lambda: os.getenv("FORCE_SUBSCRIPTION", "false").lower() == "true")
     force_channels: List[str] = Field(default_factory=lambda: [c.strip() for c in os.getenv("FORCE_CHANNELS", "").split(",") if c.strip()])
+    membership_positive_ttl: float = Field(default_factory=lambda: float(os.getenv("MEMBERSHIP_POSITIVE_TTL", "600")))
+    membership_negative_ttl: float = Field(default_factory=lambda: float(os.getenv("MEMBERSHIP_NEGATIVE_TTL", "30")))
 
     max_notes_regular: int = Field(default_factory=lambda: int(os.getenv("MAX_NOTES_REGULAR", "5")))
     max_notes_premium: int = Field(default_factory=lambda: int(os.getenv("MAX_NOTES_PREMIUM", "10")))
     max_questions_regular: int = Field(default_factory=lambda: int(os.getenv("MAX_QUESTIONS_REGULAR", "5")))
     max_questions_premium: int = Field(default_factory=lambda: int(os.getenv("MAX_QUESTIONS_PREMIUM", "10")))
+    note_cooldown_seconds: int = Field(default_factory=lambda: int(os.getenv("NOTE_COOLDOWN_SECONDS", "10")))
 
     question_type_default: str = Field(default_factory=lambda: os.getenv("QUESTION_TYPE_DEFAULT", "text"))
     maintenance_mode: bool = Field(default_factory=lambda: os.getenv("MAINTENANCE_MODE", "false").lower() == "true")
+    settings_cache_ttl_seconds: float = Field(default_factory=lambda: float(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "30")))
 
     premium_price: int = Field(default_factory=lambda: int(os.getenv("PREMIUM_PRICE", "30")))
     payment_channel: str = Field(default_factory=lambda: os.getenv("PAYMENT_CHANNEL", ""))
     telebirr_numbers: List[str] = Field(default_factory=lambda: [c.strip() for c in os.getenv("TELEBIRR_NUMBERS", "").split(",") if c.strip()])
     cbe_numbers: List[str] = Field(default_factory=lambda: [c.strip() for c in os.getenv("CBE_NUMBERS", "").split(",") if c.strip()])
 
+    quiz_cache_size: int = Field(default_factory=lambda: int(os.getenv("QUIZ_CACHE_SIZE", "512")))
+    quiz_cache_ttl_seconds: int = Field(default_factory=lambda: int(os.getenv("QUIZ_CACHE_TTL_SECONDS", "604800")))
+
+    tg_global_per_second: float = Field(default_factory=lambda: float(os.getenv("TG_GLOBAL_PER_SECOND", "30")))
+    tg_private_per_second: float = Field(default_factory=lambda: float(os.getenv("TG_PRIVATE_PER_SECOND", "1")))
+    tg_group_per_minute: float = Field(default_factory=lambda: float(os.getenv("TG_GROUP_PER_MINUTE", "20")))
+
+    broadcast_batch_size: int = Field(default_factory=lambda: int(os.getenv("BROADCAST_BATCH_SIZE", "200")))
+    broadcast_workers: int = Field(default_factory=lambda: int(os.getenv("BROADCAST_WORKERS", "8")))
+    broadcast_lease_seconds: int = Field(default_factory=lambda: int(os.getenv("BROADCAST_LEASE_SECONDS", "120")))
+
+    counter_flush_size: int = Field(default_factory=lambda: int(os.getenv("COUNTER_FLUSH_SIZE", "500")))
+    counter_flush_seconds: float = Field(default_factory=lambda: float(os.getenv("COUNTER_FLUSH_SECONDS", "10")))
+
+    delivery_workers: int = Field(default_factory=lambda: int(os.getenv("DELIVERY_WORKERS", "4")))
+    scheduler_concurrency: int = Field(default_factory=lambda: int(os.getenv("SCHEDULER_CONCURRENCY", "8")))
+    schedule_lease_seconds: int = Field(default_factory=lambda: int(os.getenv("SCHEDULE_LEASE_SECONDS", "60")))
+    scheduler_max_idle_seconds: int = Field(default_factory=lambda: int(os.getenv("SCHEDULER_MAX_IDLE_SECONDS", "300")))
+    pregen_window_seconds: int = Field(default_factory=lambda: int(os.getenv("PREGEN_WINDOW_SECONDS", "3600")))
+    pregen_concurrency: int = Field(default_factory=lambda: int(os.getenv("PREGEN_CONCURRENCY", "4")))
+    pregen_lease_seconds: int = Field(default_factory=lambda: int(os.getenv("PREGEN_LEASE_SECONDS", "600")))
+    scheduler_change_stream: bool = Field(default_factory=lambda: os.getenv("SCHEDULER_CHANGE_STREAM", "false").lower() == "true")
+
     @field_validator("question_type_default")
     @classmethod
     def validate_qtype(cls, v: str) -> str:
@@ -40,9 +99,27 @@ class Config(BaseModel):
             return "text"
         return v
 
+    @field_validator("update_mode")
+    @classmethod
+    def validate_update_mode(cls, v: str) -> str:
+        return v if v in ("polling", "webhook") else "polling"
+
+
+_config: Config | None = None
+
 
 def get_config() -> Config:
-    try:
-        return Config()
-    except ValidationError as exc:
-        raise RuntimeError(f"Invalid configuration: {exc}")
\ No newline at end of file
+    # Built once per process; the environment does not change while the bot runs
+    global _config
+    if _config is None:
+        try:
+            _config = Config()
+        except ValidationError as exc:
+            raise RuntimeError(f"Invalid configuration: {exc}")
+    return _config
+
+
+def reload_config() -> Config:
+    global _config
+    _config = None
+    return get_config()
\ No newline at end of file
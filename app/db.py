@@ -1,7 +1,7 @@
 from pymongo import MongoClient
 from pymongo.collection import Collection
 from pymongo.database import Database
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import PyMongoError
 from typing import Tuple
 from .config import get_config
 
@@ -16,21 +16,16 @@ def init_db() -> Tuple[MongoClient, Database]:
         return _client, _db
 
     cfg = get_config()
-    _client = MongoClient(cfg.mongo_uri)
+    client = MongoClient(cfg.mongo_uri, serverSelectionTimeoutMS=cfg.mongo_timeout_ms)
     try:
-        _client.admin.command("ping")
-    except ConnectionFailure as exc:
+        client.admin.command("ping")
+    except PyMongoError as exc:
+        client.close()
         raise RuntimeError(f"Failed to connect to MongoDB: {exc}")
 
-    _db = _client[cfg.mongo_db]
-
-    # Ensure indexes
-    _db["users"].create_index("id", unique=True)
-    _db["settings"].create_index("key", unique=True)
-    _db["channels"].create_index([("user_id", 1), ("chat_id", 1)], unique=True)
-    _db["payments"].create_index([("user_id", 1), ("time", 1)])
-    _db["schedules"].create_index([("user_id", 1), ("scheduled_at", 1)])
-
+    # Indexes and data fixes live in app.migrations
+    _client = client
+    _db = client[cfg.mongo_db]
     return _client, _db
 
 
@@ -38,4 +33,4 @@ def get_db() -> Database:
     if _db is None:
         init_db()
     assert _db is not None
-    return _db
\ No newline at end of file
+    return _db
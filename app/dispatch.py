@@ -0,0 +1,166 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+from telebot import ExceptionHandler
+from telebot.types import Update
+from .services.outbound import RateLimitedBot
+
+
+logger = logging.getLogger(__name__)
+
+# The shard and update the current worker thread is handling
+_local = threading.local()
+
+
+def update_key(update: Update) -> int:
+    """User the update belongs to; updates with the same key are handled in order."""
+    for event in (update.message, update.callback_query, update.chat_member, update.my_chat_member, update.edited_message):
+        if event is None:
+            continue
+        user = getattr(event, "from_user", None)
+        if user is not None:
+            return user.id
+        chat = getattr(event, "chat", None)
+        if chat is not None:
+            return chat.id
+    return update.update_id
+
+
+class _ShardFailures(ExceptionHandler):
+    """Counts and logs handler errors against the shard they happened on.
+
+    With class middlewares TeleBot catches handler exceptions itself and hands
+    them here instead of letting them reach the shard worker.
+    """
+
+    def __init__(self, dispatcher: "ShardedDispatcher") -> None:
+        self.dispatcher = dispatcher
+
+    def handle(self, exception: Exception) -> bool:
+        self.dispatcher.record_failure(exception)
+        return True
+
+
+class ShardedDispatcher:
+    """Runs updates on N worker threads, hashing each user onto one of them.
+
+    A user's updates always land on the same shard and run one at a time, which
+    keeps multi-step conversations (note, destination, delay, send) in order,
+    while different users proceed in parallel. Queues are bounded, so a full
+    shard blocks the producer instead of buffering without limit.
+
+    Handlers must stay short: anything slow (quiz generation) goes through
+    offload() so it does not hold up the other users hashed to the same shard.
+    """
+
+    def __init__(
+        self,
+        handle: Callable[[List[Update]], None],
+        shards: int = 16,
+        queue_size: int = 100,
+        background_workers: int = 16,
+    ) -> None:
+        self.handle = handle
+        self.shards = max(1, shards)
+        self._queues: List["queue.Queue[Update | None]"] = [queue.Queue(maxsize=queue_size) for _ in range(self.shards)]
+        self._processed = [0] * self.shards
+        self._failed = [0] * self.shards
+        self._threads: List[threading.Thread] = []
+        self._background = ThreadPoolExecutor(max_workers=max(1, background_workers), thread_name_prefix="dispatch-bg")
+        # Install as the bot's exception_handler so handler errors show up in stats()
+        self.exception_handler = _ShardFailures(self)
+
+    def start(self) -> None:
+        for i, q in enumerate(self._queues):
+            t = threading.Thread(target=self._work, args=(i, q), name=f"dispatch-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def shutdown(self) -> None:
+        for q in self._queues:
+            q.put(None)
+        self._background.shutdown(wait=False)
+
+    def offload(self, fn: Callable[..., Any], *args: Any) -> Future:
+        return self._background.submit(self._guarded, fn, *args)
+
+    @staticmethod
+    def _guarded(fn: Callable[..., Any], *args: Any) -> Any:
+        try:
+            return fn(*args)
+        except Exception:
+            logger.exception("Background task %s failed", getattr(fn, "__name__", fn))
+
+    def submit(self, update: Update) -> None:
+        self._queues[update_key(update) % self.shards].put(update)
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [q.qsize() for q in self._queues]
+        return {
+            "shards": self.shards,
+            "queued": sum(depths),
+            "max_depth": max(depths),
+            "busiest": depths.index(max(depths)),
+            "processed": sum(self._processed),
+            "failed": sum(self._failed),
+        }
+
+    def record_failure(self, exception: BaseException) -> None:
+        index = getattr(_local, "shard", None)
+        update = getattr(_local, "update", None)
+        if index is not None:
+            self._failed[index] += 1
+        if update is None:
+            logger.error("Update handler failed", exc_info=exception)
+        else:
+            logger.error("Update %s (user %s) failed", update.update_id, update_key(update), exc_info=exception)
+
+    def _work(self, index: int, q: "queue.Queue[Update | None]") -> None:
+        _local.shard = index
+        while True:
+            update = q.get()
+            if update is None:
+                return
+            _local.update = update
+            try:
+                self.handle([update])
+            except Exception as exc:
+                # Errors outside a handler (middlewares, update parsing) still land here
+                self.record_failure(exc)
+            finally:
+                _local.update = None
+            self._processed[index] += 1
+
+
+class DispatchingBot(RateLimitedBot):
+    """Bot whose incoming updates go through a ShardedDispatcher once one is attached.
+
+    Construct with threaded=False: the shard workers are the only concurrency, so
+    handlers run inline on them.
+    """
+
+    dispatcher: ShardedDispatcher | None = None
+
+    def process_new_updates(self, updates: List[Update]) -> None:
+        if self.dispatcher is None:
+            super().process_new_updates(updates)
+            return
+        if not updates:
+            return
+        # TeleBot only advances the polling offset inside its own process_new_updates,
+        # which now runs later on a shard; without this getUpdates returns them again
+        self.last_update_id = max(self.last_update_id, max(u.update_id for u in updates))
+        for update in updates:
+            self.dispatcher.submit(update)
+
+    def process_now(self, updates: List[Update]) -> None:
+        super().process_new_updates(updates)
+
+    def offload(self, fn: Callable[..., Any], *args: Any) -> None:
+        """Run slow work off the shard worker (inline when no dispatcher is attached)."""
+        if self.dispatcher is None:
+            fn(*args)
+        else:
+            self.dispatcher.offload(fn, *args)
@@ -0,0 +1,120 @@
+from datetime import datetime
+from typing import Callable, List, Tuple
+from pymongo.database import Database
+from .config import get_config
+from .repositories.users import UsersRepository
+
+
+# (version, description, apply) in ascending version order. Never edit an applied
+# migration; add a new one instead.
+MIGRATIONS: List[Tuple[int, str, Callable[[Database], None]]] = []
+
+
+def migration(version: int, description: str):
+    def register(fn: Callable[[Database], None]) -> Callable[[Database], None]:
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+
+    return register
+
+
+@migration(1, "base indexes")
+def _base_indexes(db: Database) -> None:
+    db["users"].create_index("id", unique=True)
+    db["settings"].create_index("key", unique=True)
+    db["channels"].create_index([("user_id", 1), ("chat_id", 1)], unique=True)
+    db["payments"].create_index([("user_id", 1), ("time", 1)])
+    db["schedules"].create_index([("user_id", 1), ("scheduled_at", 1)])
+    db["quiz_cache"].create_index("created_at", expireAfterSeconds=get_config().quiz_cache_ttl_seconds)
+
+
+@migration(2, "normalize legacy last_note_time and notes_day")
+def _normalize_note_times(db: Database) -> None:
+    UsersRepository(db).normalize_legacy_note_times()
+
+
+@migration(3, "broadcasts status index")
+def _broadcast_indexes(db: Database) -> None:
+    db["broadcasts"].create_index("status")
+
+
+@migration(4, "conversation state TTL indexes")
+def _state_ttl_indexes(db: Database) -> None:
+    for name in ("state_notes", "state_payments"):
+        db[name].create_index("expires_at", expireAfterSeconds=0)
+
+
+@migration(5, "indexes for scheduler, payment review and admin lookups")
+def _hot_query_indexes(db: Database) -> None:
+    schedules = db["schedules"]
+    # Due and pregen scans only ever look at pending schedules; claimed ones by lease expiry
+    schedules.create_index(
+        "scheduled_at", name="pending_scheduled_at", partialFilterExpression={"status": "pending"}
+    )
+    schedules.create_index(
+        "lease_expires_at", name="claimed_lease_expires_at", partialFilterExpression={"status": "claimed"}
+    )
+    schedules.create_index(
+        "pregen_next_at", name="pending_pregen_next_at", partialFilterExpression={"status": "pending"}
+    )
+    db["payments"].create_index([("status", 1), ("time", -1)])
+    db["users"].create_index("role", name="admin_role", partialFilterExpression={"role": "admin"})
+
+
+@migration(6, "keyset pagination indexes for schedule and channel menus")
+def _menu_page_indexes(db: Database) -> None:
+    db["schedules"].create_index([("user_id", 1), ("scheduled_at", -1), ("_id", -1)])
+    db["channels"].create_index([("user_id", 1), ("_id", 1)])
+
+
+@migration(7, "finished_at/resolved_at for retention and archival")
+def _retention_fields(db: Database) -> None:
+    # Best available guess for documents finished before the fields existed
+    db["schedules"].update_many(
+        {"status": {"$in": ["sent", "failed"]}, "finished_at": {"$exists": False}},
+        [{"$set": {"finished_at": "$scheduled_at"}}],
+    )
+    db["payments"].update_many(
+        {"status": {"$in": ["accepted", "declined"]}, "resolved_at": {"$exists": False}},
+        [{"$set": {"resolved_at": "$time"}}],
+    )
+    db["schedules"].create_index("finished_at", sparse=True)
+    db["payments"].create_index("resolved_at", sparse=True)
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(db: Database) -> int:
+    doc = db["migrations"].find_one({"_id": "schema"})
+    return int((doc or {}).get("version", 0))
+
+
+def apply_migrations(db: Database) -> List[int]:
+    applied = []
+    version = current_version(db)
+    for number, description, fn in MIGRATIONS:
+        if number <= version:
+            continue
+        fn(db)
+        db["migrations"].update_one(
+            {"_id": "schema"},
+            {"$set": {"version": number, "description": description, "applied_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        applied.append(number)
+    return applied
+
+
+if __name__ == "__main__":
+    import sys
+    from .db import get_db
+
+    if sys.argv[1:] == ["check"]:
+        from .query_plans import check_query_plans
+
+        sys.exit(0 if check_query_plans(get_db()) else 1)
+    done = apply_migrations(get_db())
+    print(f"Applied migrations: {done}" if done else f"Schema already at version {latest_version()}")
@@ -19,9 +19,11 @@ class User(BaseModel):
     registered_at: datetime = Field(default_factory=datetime.utcnow)
     total_notes: int = 0
     notes_today: int = 0
+    notes_day: Optional[str] = None
     last_note_time: Optional[datetime] = None
     default_question_type: Literal["text", "poll"] = "text"
     questions_per_note: int = 5
+    fresh_questions: bool = False
 
 
 class Setting(BaseModel):
@@ -36,6 +38,7 @@ class Payment(BaseModel):
     photo_file_id: Optional[str] = None
     status: Literal["pending", "accepted", "declined"] = "pending"
     time: datetime = Field(default_factory=datetime.utcnow)
+    resolved_at: Optional[datetime] = None
 
 
 class UserChannel(BaseModel):
@@ -54,6 +57,13 @@ class Schedule(BaseModel):
     num_questions: int
     question_type: Literal["text", "poll"] = "text"
     delay_seconds: int = 5
+    fresh: bool = False
     scheduled_at: datetime
-    status: Literal["pending", "sent", "failed"] = "pending"
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    status: Literal["pending", "claimed", "sent", "failed"] = "pending"
+    claimed_by: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    questions: Optional[List[QuizQuestion]] = None
+    pregen_attempts: int = 0
+    pregen_next_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
\ No newline at end of file
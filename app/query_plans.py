@@ -0,0 +1,131 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+from bson import ObjectId
+from pymongo.collection import Collection
+from pymongo.database import Database
+from .repositories.broadcasts import BroadcastsRepository
+from .repositories.channels import ChannelsRepository
+from .repositories.payments import PaymentsRepository
+from .repositories.schedules import SchedulesRepository
+from .repositories.users import UsersRepository
+
+
+class _Result:
+    modified_count = 0
+    deleted_count = 0
+    inserted_id = None
+
+
+class _Cursor(list):
+    def __init__(self, command: Dict[str, Any]) -> None:
+        super().__init__()
+        self.command = command
+
+    def sort(self, key: Any, direction: int = 1) -> "_Cursor":
+        self.command["sort"] = _sort_doc(key if isinstance(key, list) else [(key, direction)])
+        return self
+
+    def limit(self, n: int) -> "_Cursor":
+        self.command["limit"] = n
+        return self
+
+
+def _sort_doc(sort: List[Tuple[str, int]] | None) -> Dict[str, int]:
+    return {k: v for k, v in (sort or [])}
+
+
+class _RecordingCollection:
+    """Stands in for a repository's collection and records the commands it would run."""
+
+    def __init__(self, collection: Collection) -> None:
+        self.name = collection.name
+        self.commands: List[Dict[str, Any]] = []
+
+    def find(self, filter: Dict[str, Any] | None = None, projection: Any = None, sort: Any = None, **_: Any) -> _Cursor:
+        cmd: Dict[str, Any] = {"find": self.name, "filter": filter or {}}
+        if projection:
+            cmd["projection"] = projection
+        if sort:
+            cmd["sort"] = _sort_doc(sort)
+        self.commands.append(cmd)
+        return _Cursor(cmd)
+
+    def find_one(self, filter: Dict[str, Any] | None = None, projection: Any = None, sort: Any = None, **_: Any) -> None:
+        cmd = self.find(filter, projection, sort).command
+        cmd["limit"] = 1
+        return None
+
+    def find_one_and_update(self, filter: Dict[str, Any], update: Any, sort: Any = None, **_: Any) -> None:
+        cmd: Dict[str, Any] = {"findAndModify": self.name, "query": filter, "update": update}
+        if sort:
+            cmd["sort"] = _sort_doc(sort)
+        self.commands.append(cmd)
+        return None
+
+    def update_one(self, filter: Dict[str, Any], update: Any, **_: Any) -> _Result:
+        self.commands.append({"update": self.name, "updates": [{"q": filter, "u": update, "multi": False}]})
+        return _Result()
+
+    def update_many(self, filter: Dict[str, Any], update: Any, **_: Any) -> _Result:
+        self.commands.append({"update": self.name, "updates": [{"q": filter, "u": update, "multi": True}]})
+        return _Result()
+
+    def delete_one(self, filter: Dict[str, Any], **_: Any) -> _Result:
+        self.commands.append({"delete": self.name, "deletes": [{"q": filter, "limit": 1}]})
+        return _Result()
+
+
+def hot_queries(db: Database) -> List[Tuple[str, Any, Callable[[Any], Any]]]:
+    """(label, repository, call) for every query on a request or scheduler path.
+
+    Whole-collection reads that are meant to scan (settings snapshot) are left out.
+    """
+    now = datetime.utcnow()
+    schedules = SchedulesRepository(db)
+    users = UsersRepository(db)
+    payments = PaymentsRepository(db)
+    channels = ChannelsRepository(db)
+    broadcasts = BroadcastsRepository(db)
+    return [
+        ("schedules.claim_due", schedules, lambda r: r.claim_due(now, "check", 60)),
+        ("schedules.next_wakeup", schedules, lambda r: r.next_wakeup("check")),
+        ("schedules.claim_pregen", schedules, lambda r: r.claim_pregen(now, now, 60)),
+        ("schedules.next_pregen_at", schedules, lambda r: r.next_pregen_at(now, 3600)),
+        ("schedules.page_user_schedules", schedules, lambda r: r.page_user_schedules(0, [now, ObjectId()])),
+        ("schedules.delete", schedules, lambda r: r.delete(0, "0" * 24)),
+        ("users.get", users, lambda r: r.get(0)),
+        ("users.admit_note", users, lambda r: r.admit_note(0, "1970-01-01", 1, 1, 1, now)),
+        ("users.list_admin_ids", users, lambda r: r.list_admin_ids()),
+        ("users.broadcast_batch", users, lambda r: r.broadcast_batch(None, 100)),
+        ("payments.list_pending", payments, lambda r: r.list_pending()),
+        ("payments.update_status", payments, lambda r: r.update_status(0, "approved")),
+        ("channels.page_channels", channels, lambda r: r.page_channels(0, [ObjectId()])),
+        ("channels.get_channel", channels, lambda r: r.get_channel(0, 0)),
+        ("broadcasts.claim", broadcasts, lambda r: r.claim("check", 60)),
+    ]
+
+
+def _stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
+
+
+def check_query_plans(db: Database) -> bool:
+    """Explain each hot query against the live database; False if any of them is a COLLSCAN."""
+    ok = True
+    for label, repo, call in hot_queries(db):
+        recorder = _RecordingCollection(repo.collection)
+        repo.collection = recorder
+        call(repo)
+        for cmd in recorder.commands:
+            explained = db.command("explain", cmd, verbosity="queryPlanner")
+            stages = _stages(explained["queryPlanner"]["winningPlan"])
+            scan = "COLLSCAN" in stages
+            ok = ok and not scan
+            print(f"{'FAIL' if scan else 'ok  '} {label}: {' <- '.join(s for s in stages if s)}")
+    return ok
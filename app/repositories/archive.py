@@ -0,0 +1,82 @@
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import bson
+from bson import Binary
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+
+# Stay well under MongoDB's 16MB document limit
+MAX_PACKED_BYTES = 12 * 1024 * 1024
+
+
+def pack(docs: List[Dict[str, Any]]) -> bytes:
+    return zlib.compress(b"".join(bson.encode(d) for d in docs), 6)
+
+
+def unpack(data: bytes) -> List[Dict[str, Any]]:
+    return bson.decode_all(zlib.decompress(data))
+
+
+class ArchiveRepository:
+    """Compressed cold storage: each archive document is one zlib-packed batch of BSON documents."""
+
+    def __init__(self, db: Database) -> None:
+        self.db = db
+        self.runs = db["archive_runs"]
+
+    def archive_collection(self, source: str):
+        return self.db[f"{source}_archive"]
+
+    def expired(self, source: str, query: Dict[str, Any], order_by: str, limit: int) -> List[Dict[str, Any]]:
+        return list(self.db[source].find(query).sort(order_by, 1).limit(limit))
+
+    def move(self, source: str, docs: List[Dict[str, Any]]) -> int:
+        # Archive first, then delete: a crash in between leaves a duplicate in the archive, never a loss
+        data = pack(docs)
+        if len(data) > MAX_PACKED_BYTES and len(docs) > 1:
+            half = len(docs) // 2
+            return self.move(source, docs[:half]) + self.move(source, docs[half:])
+        ids = [d["_id"] for d in docs]
+        self.archive_collection(source).insert_one(
+            {
+                "count": len(docs),
+                "first_id": ids[0],
+                "last_id": ids[-1],
+                "archived_at": datetime.utcnow(),
+                "data": Binary(data),
+            }
+        )
+        return self.db[source].delete_many({"_id": {"$in": ids}}).deleted_count
+
+    def totals(self, source: str) -> Dict[str, int]:
+        rows = list(
+            self.archive_collection(source).aggregate(
+                [{"$group": {"_id": None, "docs": {"$sum": "$count"}, "batches": {"$sum": 1}}}]
+            )
+        )
+        row = rows[0] if rows else {}
+        return {"docs": int(row.get("docs", 0)), "batches": int(row.get("batches", 0))}
+
+    def acquire_lock(self, owner: str, lease_seconds: int) -> bool:
+        # One replica archives at a time
+        now = datetime.utcnow()
+        try:
+            self.runs.update_one(
+                {"_id": "lock", "$or": [{"until": {"$lt": now}}, {"owner": owner}]},
+                {"$set": {"owner": owner, "until": now + timedelta(seconds=lease_seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def release_lock(self, owner: str) -> None:
+        self.runs.delete_one({"_id": "lock", "owner": owner})
+
+    def record_run(self, report: Dict[str, Any]) -> None:
+        self.runs.insert_one(report)
+
+    def last_run(self) -> Optional[Dict[str, Any]]:
+        return self.runs.find_one({"_id": {"$ne": "lock"}}, sort=[("started_at", -1)])
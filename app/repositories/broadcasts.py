@@ -0,0 +1,111 @@
+from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.database import Database
+
+
+class BroadcastsRepository:
+    def __init__(self, db: Database) -> None:
+        self.collection = db["broadcasts"]
+
+    def create(self, text: str, created_by: int, owner: str, lease_seconds: int) -> ObjectId:
+        # Created already claimed by the replica that accepted the command
+        now = datetime.utcnow()
+        doc = {
+            "text": text,
+            "created_by": created_by,
+            "status": "running",
+            "claimed_by": owner,
+            "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            "last_id": None,
+            "sent": 0,
+            "failed": 0,
+            "blocked": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        return self.collection.insert_one(doc).inserted_id
+
+    def get(self, broadcast_id: ObjectId) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": broadcast_id})
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one(sort=[("_id", -1)])
+
+    def claim(self, owner: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        # A running broadcast nobody holds, or whose holder stopped renewing its lease
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {
+                "status": "running",
+                "$or": [{"claimed_by": None}, {"lease_expires_at": {"$lt": now}}],
+            },
+            {"$set": {"claimed_by": owner, "lease_expires_at": now + timedelta(seconds=lease_seconds)}},
+            sort=[("_id", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def renew(self, broadcast_id: ObjectId, owner: str, lease_seconds: int) -> bool:
+        # False once the broadcast was paused (from any replica) or the claim was lost
+        res = self.collection.update_one(
+            {"_id": broadcast_id, "status": "running", "claimed_by": owner},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}},
+        )
+        return res.matched_count > 0
+
+    def release(self, broadcast_id: ObjectId, owner: str) -> None:
+        self.collection.update_one(
+            {"_id": broadcast_id, "claimed_by": owner},
+            {"$set": {"claimed_by": None, "lease_expires_at": None}},
+        )
+
+    def set_status(self, broadcast_id: ObjectId, status: str, error: str | None = None) -> None:
+        # Pausing or resuming drops the claim; a running broadcast is then claimed afresh
+        self.collection.update_one(
+            {"_id": broadcast_id},
+            {
+                "$set": {
+                    "status": status,
+                    "error": error,
+                    "claimed_by": None,
+                    "lease_expires_at": None,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+        )
+
+    def finish(self, broadcast_id: ObjectId, owner: str, status: str, error: str | None = None) -> None:
+        self.collection.update_one(
+            {"_id": broadcast_id, "claimed_by": owner},
+            {
+                "$set": {
+                    "status": status,
+                    "error": error,
+                    "claimed_by": None,
+                    "lease_expires_at": None,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+        )
+
+    def advance(
+        self,
+        broadcast_id: ObjectId,
+        expected_last_id: ObjectId | None,
+        last_id: ObjectId,
+        sent: int,
+        failed: int,
+        blocked: int,
+    ) -> bool:
+        # Keyed on the previous position rather than the claim, so a batch that was in
+        # flight when the broadcast got paused is still counted, but never twice
+        res = self.collection.update_one(
+            {"_id": broadcast_id, "last_id": expected_last_id},
+            {
+                "$set": {"last_id": last_id, "updated_at": datetime.utcnow()},
+                "$inc": {"sent": sent, "failed": failed, "blocked": blocked},
+            },
+        )
+        return res.modified_count > 0
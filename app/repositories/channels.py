@@ -1,5 +1,6 @@
-from typing import List, Optional, Dict, Any
+from typing import Optional, Dict, Any, Sequence
 from pymongo.database import Database
+from .paging import Page, fetch_page
 
 
 class ChannelsRepository:
@@ -16,8 +17,18 @@ class ChannelsRepository:
     def remove_channel(self, user_id: int, chat_id: int) -> None:
         self.collection.delete_one({"user_id": user_id, "chat_id": chat_id})
 
-    def list_channels(self, user_id: int) -> List[Dict[str, Any]]:
-        return list(self.collection.find({"user_id": user_id}))
+    def page_channels(
+        self, user_id: int, cursor: Optional[Sequence[Any]] = None, backward: bool = False, limit: int = 8
+    ) -> Page:
+        return fetch_page(
+            self.collection,
+            {"user_id": user_id},
+            [("_id", 1)],
+            cursor,
+            backward,
+            limit,
+            {"chat_id": 1, "title": 1, "username": 1},
+        )
 
     def get_channel(self, user_id: int, chat_id: int) -> Optional[Dict[str, Any]]:
         return self.collection.find_one({"user_id": user_id, "chat_id": chat_id})
\ No newline at end of file
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from bson import ObjectId
+from pymongo.collection import Collection
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class Page:
+    __slots__ = ("items", "has_prev", "has_next")
+
+    def __init__(self, items: List[Dict[str, Any]], has_prev: bool, has_next: bool) -> None:
+        self.items = items
+        self.has_prev = has_prev
+        self.has_next = has_next
+
+
+def fetch_page(
+    collection: Collection,
+    query: Dict[str, Any],
+    keys: Sequence[Tuple[str, int]],
+    cursor: Optional[Sequence[Any]],
+    backward: bool,
+    limit: int,
+    projection: Dict[str, int],
+) -> Page:
+    """Keyset pagination: one page of `limit` documents after (or before) `cursor`.
+
+    `keys` is the sort order and must end in a unique field; `cursor` holds the key
+    values of the last item of the previous page (first item when going back).
+    """
+    sort = [(field, -d if backward else d) for field, d in keys]
+    if cursor is not None:
+        query = {"$and": [query, _after(sort, cursor)]}
+    docs = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    more = len(docs) > limit
+    docs = docs[:limit]
+    if backward:
+        docs.reverse()
+        return Page(docs, has_prev=more, has_next=True)
+    return Page(docs, has_prev=cursor is not None, has_next=more)
+
+
+def _after(sort: Sequence[Tuple[str, int]], values: Sequence[Any]) -> Dict[str, Any]:
+    # (a, b) > (x, y) in sort order  ==  a > x  or  (a == x and b > y)
+    branches = []
+    for i, (field, d) in enumerate(sort):
+        branch = {f: values[j] for j, (f, _) in enumerate(sort[:i])}
+        branch[field] = {"$gt" if d == 1 else "$lt": values[i]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    # Compact enough for Telegram's 64-byte callback_data
+    parts = []
+    for v in values:
+        if isinstance(v, datetime):
+            parts.append(str((v - EPOCH) // timedelta(milliseconds=1)))
+        else:
+            parts.append(str(v))
+    return "_".join(parts)
+
+
+def decode_cursor(text: str, types: Sequence[type]) -> Optional[List[Any]]:
+    parts = text.split("_")
+    if len(parts) != len(types):
+        return None
+    values: List[Any] = []
+    try:
+        for part, t in zip(parts, types):
+            if t is datetime:
+                values.append(EPOCH + timedelta(milliseconds=int(part)))
+            elif t is ObjectId:
+                values.append(ObjectId(part))
+            else:
+                values.append(t(part))
+    except Exception:
+        return None
+    return values
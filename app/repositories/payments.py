@@ -19,7 +19,7 @@ class PaymentsRepository:
         self.collection.insert_one(doc)
 
     def update_status(self, user_id: int, status: str) -> None:
-        self.collection.update_many({"user_id": user_id, "status": "pending"}, {"$set": {"status": status}})
+        self.collection.update_many({"user_id": user_id, "status": "pending"}, {"$set": {"status": status, "resolved_at": datetime.utcnow()}})
 
     def list_pending(self) -> List[Dict[str, Any]]:
         return list(self.collection.find({"status": "pending"}).sort("time", -1))
\ No newline at end of file
@@ -1,7 +1,18 @@
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Sequence
+from pymongo import ReturnDocument
 from pymongo.database import Database
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
+from .paging import Page, fetch_page
+
+
+USER_SCHEDULE_KEYS = [("scheduled_at", -1), ("_id", -1)]
+
+_create_listeners: List[Callable[[datetime], None]] = []
+
+
+def on_schedule_created(listener: Callable[[datetime], None]) -> None:
+    _create_listeners.append(listener)
 
 
 class SchedulesRepository:
@@ -10,11 +21,15 @@ class SchedulesRepository:
 
     def create(self, schedule: Dict[str, Any]) -> str:
         res = self.collection.insert_one(schedule)
+        when = schedule.get("scheduled_at")
+        if isinstance(when, datetime):
+            for listener in list(_create_listeners):
+                try:
+                    listener(when)
+                except Exception:
+                    pass
         return str(res.inserted_id)
 
-    def set_status(self, schedule_id: Any, status: str) -> None:
-        self.collection.update_one({"_id": schedule_id}, {"$set": {"status": status}})
-
     def delete(self, user_id: int, sched_id: str) -> bool:
         try:
             oid = ObjectId(sched_id)
@@ -23,10 +38,113 @@ class SchedulesRepository:
         res = self.collection.delete_one({"_id": oid, "user_id": user_id})
         return res.deleted_count > 0
 
-    def due_schedules(self, now: datetime) -> List[Dict[str, Any]]:
-        return list(
-            self.collection.find({"status": "pending", "scheduled_at": {"$lte": now}}).sort("scheduled_at", 1)
+    def claim_due(self, now: datetime, owner: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        # A claimed schedule whose lease ran out belongs to a dead or stalled replica
+        return self.collection.find_one_and_update(
+            {
+                "scheduled_at": {"$lte": now},
+                "$or": [
+                    {"status": "pending"},
+                    {"status": "claimed", "lease_expires_at": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": "claimed",
+                    "claimed_by": owner,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                },
+                "$inc": {"claim_count": 1},
+            },
+            sort=[("scheduled_at", 1)],
+            return_document=ReturnDocument.AFTER,
         )
 
-    def get_user_schedules(self, user_id: int) -> List[Dict[str, Any]]:
-        return list(self.collection.find({"user_id": user_id}).sort("scheduled_at", -1))
\ No newline at end of file
+    def next_wakeup(self, owner: str | None = None) -> Optional[datetime]:
+        # Earliest moment something becomes claimable: a pending schedule or an expiring lease
+        candidates = []
+        nxt = self.collection.find_one({"status": "pending"}, {"scheduled_at": 1}, sort=[("scheduled_at", 1)])
+        if nxt and nxt.get("scheduled_at"):
+            candidates.append(nxt["scheduled_at"])
+        lease = self.collection.find_one(
+            {"status": "claimed", "claimed_by": {"$ne": owner}},
+            {"lease_expires_at": 1},
+            sort=[("lease_expires_at", 1)],
+        )
+        if lease and lease.get("lease_expires_at"):
+            candidates.append(lease["lease_expires_at"])
+        return min(candidates) if candidates else None
+
+    def claim_pregen(self, now: datetime, horizon: datetime, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        # pregen_next_at doubles as the pregeneration lease and as the retry time after a failed attempt
+        return self.collection.find_one_and_update(
+            {
+                "status": "pending",
+                "questions": None,
+                "scheduled_at": {"$lte": horizon},
+                "pregen_next_at": {"$not": {"$gt": now}},
+            },
+            {
+                "$set": {"pregen_next_at": now + timedelta(seconds=lease_seconds)},
+                "$inc": {"pregen_attempts": 1},
+            },
+            sort=[("scheduled_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def store_questions(self, schedule_id: Any, questions: List[Dict[str, Any]]) -> None:
+        self.collection.update_one(
+            {"_id": schedule_id, "status": {"$in": ["pending", "claimed"]}},
+            {"$set": {"questions": questions}, "$unset": {"pregen_next_at": ""}},
+        )
+
+    def retry_pregen_at(self, schedule_id: Any, when: datetime) -> None:
+        self.collection.update_one({"_id": schedule_id, "questions": None}, {"$set": {"pregen_next_at": when}})
+
+    def next_pregen_at(self, now: datetime, window_seconds: int) -> Optional[datetime]:
+        candidates = []
+        first = self.collection.find_one(
+            {"status": "pending", "questions": None, "pregen_next_at": {"$not": {"$gt": now}}},
+            {"scheduled_at": 1},
+            sort=[("scheduled_at", 1)],
+        )
+        if first and first.get("scheduled_at"):
+            candidates.append(first["scheduled_at"] - timedelta(seconds=window_seconds))
+        retry = self.collection.find_one(
+            {"status": "pending", "questions": None, "pregen_next_at": {"$gt": now}},
+            {"pregen_next_at": 1},
+            sort=[("pregen_next_at", 1)],
+        )
+        if retry:
+            candidates.append(retry["pregen_next_at"])
+        return min(candidates) if candidates else None
+
+    def renew_leases(self, schedule_ids: List[Any], owner: str, lease_seconds: int) -> int:
+        if not schedule_ids:
+            return 0
+        res = self.collection.update_many(
+            {"_id": {"$in": schedule_ids}, "status": "claimed", "claimed_by": owner},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}},
+        )
+        return res.modified_count
+
+    def finish(self, schedule_id: Any, owner: str, status: str) -> bool:
+        res = self.collection.update_one(
+            {"_id": schedule_id, "status": "claimed", "claimed_by": owner},
+            {"$set": {"status": status, "finished_at": datetime.utcnow()}, "$unset": {"lease_expires_at": ""}},
+        )
+        return res.modified_count > 0
+
+    def page_user_schedules(
+        self, user_id: int, cursor: Optional[Sequence[Any]] = None, backward: bool = False, limit: int = 8
+    ) -> Page:
+        # Newest first; leaves out note and questions, which the menu never shows
+        return fetch_page(
+            self.collection,
+            {"user_id": user_id},
+            USER_SCHEDULE_KEYS,
+            cursor,
+            backward,
+            limit,
+            {"target_label": 1, "scheduled_at": 1, "status": 1},
+        )
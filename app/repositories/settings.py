@@ -1,19 +1,88 @@
-from typing import Any, Optional
+import copy
+import threading
+import time
+from typing import Any, Dict, Optional
 from pymongo.database import Database
 
 
+class _Snapshot:
+    __slots__ = ("values", "version", "loaded_at")
+
+    def __init__(self, values: Dict[str, Any], version: int) -> None:
+        self.values = values
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+
+def _expired(values: Dict[str, Any], version: int) -> _Snapshot:
+    # Reloaded on next read; only holds the version so older reloads can't install
+    snap = _Snapshot(values, version)
+    snap.loaded_at = float("-inf")
+    return snap
+
+
+_snapshots: Dict[str, _Snapshot] = {}
+_lock = threading.Lock()
+
+
 class SettingsRepository:
-    def __init__(self, db: Database) -> None:
+    # Reads come from an in-memory snapshot of the whole collection. Writes through
+    # set() update it immediately; changes made by other replicas show up after the TTL.
+
+    def __init__(self, db: Database, ttl_seconds: float = 30.0) -> None:
         self.collection = db["settings"]
+        self.ttl_seconds = ttl_seconds
+        self._name = self.collection.full_name
+
+    def _snapshot(self) -> _Snapshot:
+        snap = _snapshots.get(self._name)
+        if snap is not None and time.monotonic() - snap.loaded_at < self.ttl_seconds:
+            return snap
+        seen = snap.version if snap is not None else 0
+        docs = self.collection.find({}, {"key": 1, "value": 1})
+        values = {doc["key"]: doc["value"] for doc in docs if "key" in doc and "value" in doc}
+        with _lock:
+            current = _snapshots.get(self._name)
+            latest = current.version if current is not None else 0
+            if latest != seen:
+                # A set() or invalidate() landed while we were reading, so this copy may be
+                # older than it: serve this one read from it but don't install it
+                return _Snapshot(values, latest)
+            snap = _Snapshot(values, seen + 1)
+            _snapshots[self._name] = snap
+        return snap
 
     def get(self, key: str, default: Any | None = None) -> Any:
-        doc = self.collection.find_one({"key": key})
-        if not doc:
+        values = self._snapshot().values
+        if key not in values:
             return default
-        return doc.get("value", default)
+        value = values[key]
+        # Callers sometimes append to list settings before saving them back
+        return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
 
     def set(self, key: str, value: Any) -> None:
         self.collection.update_one({"key": key}, {"$set": {"value": value}}, upsert=True)
+        with _lock:
+            snap = _snapshots.get(self._name)
+            if snap is None:
+                # Nothing cached yet, but a reload may be in flight: bump the version past it
+                _snapshots[self._name] = _expired({}, 1)
+                return
+            values = dict(snap.values)
+            values[key] = copy.deepcopy(value)
+            fresh = _Snapshot(values, snap.version + 1)
+            fresh.loaded_at = snap.loaded_at
+            _snapshots[self._name] = fresh
+
+    def version(self) -> int:
+        return self._snapshot().version
+
+    def invalidate(self) -> None:
+        # Keep the version counting up so a reload already in flight can't install over this
+        with _lock:
+            snap = _snapshots.get(self._name)
+            if snap is not None:
+                _snapshots[self._name] = _expired(snap.values, snap.version + 1)
 
     def all(self) -> list[dict]:
-        return list(self.collection.find({}))
\ No newline at end of file
+        return list(self.collection.find({}))
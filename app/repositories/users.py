@@ -1,5 +1,7 @@
-from typing import Optional, Dict, Any
-from datetime import datetime
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
 from pymongo.database import Database
 
 
@@ -21,14 +23,31 @@ class UsersRepository:
                 "registered_at": now,
                 "total_notes": 0,
                 "notes_today": 0,
+                "notes_day": None,
                 "last_note_time": None,
                 "default_question_type": "text",
                 "questions_per_note": 5,
+                "fresh_questions": False,
             },
-            "$set": {"username": username} if username else {},
+            # /start after blocking the bot means the user can be messaged again
+            "$set": {"blocked": False},
         }
-        self.collection.update_one({"id": user_id}, update, upsert=True)
-        return self.get(user_id) or {}
+        if username:
+            update["$set"]["username"] = username
+            del update["$setOnInsert"]["username"]
+        doc = self.collection.find_one_and_update(
+            {"id": user_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return doc or {}
+
+    def apply(self, user_id: int, set_fields: Dict[str, Any], inc_fields: Dict[str, int]) -> None:
+        update: Dict[str, Any] = {}
+        if set_fields:
+            update["$set"] = set_fields
+        if inc_fields:
+            update["$inc"] = inc_fields
+        if update:
+            self.collection.update_one({"id": user_id}, update)
 
     def set_premium(self, user_id: int, days: int) -> None:
         now = datetime.utcnow()
@@ -59,20 +78,106 @@ class UsersRepository:
     def set_default_qtype(self, user_id: int, qtype: str) -> None:
         self.collection.update_one({"id": user_id}, {"$set": {"default_question_type": qtype}})
 
-    def reset_notes_if_new_day(self, user_id: int) -> None:
-        user = self.get(user_id)
-        if not user:
-            return
-        last = user.get("last_note_time")
-        if not last:
-            return
-        if isinstance(last, str):
-            try:
-                last = datetime.fromisoformat(last)
-            except Exception:
-                last = None
-        if not last:
-            return
-        now = datetime.utcnow()
-        if last.date() != now.date():
-            self.collection.update_one({"id": user_id}, {"$set": {"notes_today": 0}})
\ No newline at end of file
+    def set_fresh_questions(self, user_id: int, value: bool) -> None:
+        self.collection.update_one({"id": user_id}, {"$set": {"fresh_questions": value}})
+
+    def list_admin_ids(self) -> List[int]:
+        return [u["id"] for u in self.collection.find({"role": "admin"}, {"id": 1}) if "id" in u]
+
+    def set_blocked(self, user_id: int) -> None:
+        self.collection.update_one({"id": user_id}, {"$set": {"blocked": True}})
+
+    def broadcast_batch(self, after: ObjectId | None, limit: int) -> List[Dict[str, Any]]:
+        # Keyset on _id so a resumed broadcast continues where it stopped without skip()
+        query: Dict[str, Any] = {"blocked": {"$ne": True}}
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        return list(self.collection.find(query, {"id": 1}).sort("_id", 1).limit(limit))
+
+    def admit_note(
+        self,
+        user_id: int,
+        day: str,
+        regular_limit: int,
+        premium_limit: int,
+        cooldown_seconds: int,
+        now: datetime | None = None,
+    ) -> Optional[Dict[str, Any]]:
+        # One round trip: roll the day bucket over, check limit and cooldown, take a slot.
+        # Returns the updated user, or None when the user may not submit right now.
+        now = now or datetime.utcnow()
+        limit = {"$cond": [{"$eq": ["$type", "premium"]}, premium_limit, regular_limit]}
+        return self.collection.find_one_and_update(
+            {
+                "id": user_id,
+                "$expr": {
+                    "$and": [
+                        {
+                            "$or": [
+                                {"$ne": ["$notes_day", day]},
+                                {"$lt": [{"$ifNull": ["$notes_today", 0]}, limit]},
+                            ]
+                        },
+                        {
+                            "$or": [
+                                {"$eq": [{"$ifNull": ["$last_note_time", None]}, None]},
+                                {"$lte": ["$last_note_time", now - timedelta(seconds=cooldown_seconds)]},
+                            ]
+                        },
+                    ]
+                },
+            },
+            [
+                {
+                    "$set": {
+                        "notes_today": {
+                            "$cond": [
+                                {"$eq": ["$notes_day", day]},
+                                {"$add": [{"$ifNull": ["$notes_today", 0]}, 1]},
+                                1,
+                            ]
+                        },
+                        "notes_day": day,
+                        "last_note_time": now,
+                    }
+                }
+            ],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def release_note(self, user_id: int, day: str) -> None:
+        self.collection.update_one(
+            {"id": user_id, "notes_day": day, "notes_today": {"$gt": 0}},
+            {"$inc": {"notes_today": -1}},
+        )
+
+    def normalize_legacy_note_times(self) -> None:
+        # Older documents stored last_note_time as an ISO string and had no notes_day bucket
+        self.collection.update_many(
+            {"last_note_time": {"$type": "string"}},
+            [
+                {
+                    "$set": {
+                        "last_note_time": {
+                            "$dateFromString": {"dateString": "$last_note_time", "onError": None, "onNull": None}
+                        }
+                    }
+                }
+            ],
+        )
+        self.collection.update_many(
+            {"notes_day": {"$exists": False}},
+            [
+                {
+                    "$set": {
+                        "notes_day": {
+                            "$cond": [
+                                {"$eq": [{"$type": "$last_note_time"}, "date"]},
+                                {"$dateToString": {"format": "%Y-%m-%d", "date": "$last_note_time"}},
+                                None,
+                            ]
+                        }
+                    }
+                }
+            ],
+        )
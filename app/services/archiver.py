@@ -0,0 +1,89 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict
+from pymongo.database import Database
+from ..repositories.archive import ArchiveRepository
+from .settings_service import SettingsService
+
+
+# source collection -> (settings key for retention days, finished statuses, timestamp field)
+POLICIES = {
+    "schedules": ("retention_days_schedules", ["sent", "failed"], "finished_at"),
+    "payments": ("retention_days_payments", ["accepted", "declined"], "resolved_at"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class Archiver:
+    """Moves finished schedules and resolved payments out of the hot collections.
+
+    Every `interval_seconds`, documents finished longer ago than their collection's
+    retention (a runtime setting, 0 = keep forever) are packed in batches into
+    `<collection>_archive` and deleted from the source.
+    """
+
+    def __init__(self, db: Database, batch_size: int = 500, interval_seconds: float = 3600) -> None:
+        self.repo = ArchiveRepository(db)
+        self.settings = SettingsService(db)
+        self.batch_size = max(1, batch_size)
+        self.interval_seconds = interval_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Archiver run failed")
+
+    def retention_days(self, source: str) -> int:
+        return self.settings.get_int(POLICIES[source][0])
+
+    def run_once(self) -> Dict[str, Any] | None:
+        if not self.repo.acquire_lock(self.owner, lease_seconds=int(self.interval_seconds)):
+            return None
+        report: Dict[str, Any] = {"started_at": datetime.utcnow(), "owner": self.owner, "moved": {}, "error": None}
+        try:
+            for source in POLICIES:
+                report["moved"][source] = self._archive(source)
+            return report
+        except Exception as exc:
+            # Recorded so /archivereport shows it; the caller logs the traceback
+            report["error"] = str(exc)
+            raise
+        finally:
+            report["finished_at"] = datetime.utcnow()
+            try:
+                self.repo.record_run(report)
+            finally:
+                self.repo.release_lock(self.owner)
+
+    def _archive(self, source: str) -> int:
+        days = self.retention_days(source)
+        if days <= 0:
+            return 0
+        _, statuses, field = POLICIES[source]
+        query = {"status": {"$in": statuses}, field: {"$lt": datetime.utcnow() - timedelta(days=days)}}
+        moved = 0
+        while not self._stop.is_set():
+            docs = self.repo.expired(source, query, field, self.batch_size)
+            if not docs:
+                break
+            moved += self.repo.move(source, docs)
+        return moved
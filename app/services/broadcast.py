@@ -0,0 +1,160 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+from bson import ObjectId
+from pymongo.database import Database
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+from ..repositories.broadcasts import BroadcastsRepository
+from ..repositories.users import UsersRepository
+from .outbound import bulk_priority
+
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastEngine:
+    """Sends one message to every user, resumably and once across replicas.
+
+    A replica works on a broadcast only while it holds its lease, claimed with
+    find_one_and_update like scheduled quizzes. The lease is renewed before every
+    batch; that renewal also fails once the broadcast is paused from any replica,
+    which stops the sender. A watcher claims running broadcasts that nobody holds
+    (new, resumed, or left by a dead replica).
+
+    Users are read in `_id` order in batches of ids only, and progress is saved
+    after each batch, so a stopped broadcast continues from the last saved batch
+    (at most one batch may be sent twice). Sends go through the bot's rate
+    limiter at bulk priority. Users who blocked the bot are flagged and skipped
+    by later broadcasts.
+    """
+
+    def __init__(
+        self, db: Database, bot: TeleBot, batch_size: int = 200, workers: int = 8, lease_seconds: int = 120
+    ) -> None:
+        self.bot = bot
+        self.repo = BroadcastsRepository(db)
+        self.users = UsersRepository(db)
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="broadcast")
+        self._running: set[ObjectId] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._watcher: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="broadcast-watch", daemon=True)
+        self._watcher.start()
+
+    def shutdown(self) -> None:
+        # Senders stop after their current batch and release their claims for other replicas
+        self._stop.set()
+        self._wake.set()
+        self._pool.shutdown(wait=False)
+
+    def create(self, text: str, created_by: int) -> ObjectId:
+        broadcast_id = self.repo.create(text, created_by, self.owner, self.lease_seconds)
+        self._launch(broadcast_id)
+        return broadcast_id
+
+    def pause(self, broadcast_id: ObjectId) -> None:
+        self.repo.set_status(broadcast_id, "paused")
+
+    def resume(self, broadcast_id: ObjectId) -> None:
+        self.repo.set_status(broadcast_id, "running")
+        self._wake.set()
+
+    def _watch(self) -> None:
+        while not self._stop.is_set():
+            try:
+                while not self._stop.is_set():
+                    doc = self.repo.claim(self.owner, self.lease_seconds)
+                    if doc is None:
+                        break
+                    self._launch(doc["_id"])
+            except Exception:
+                logger.exception("Claiming broadcasts failed")
+            self._wake.wait(self.lease_seconds / 2)
+            self._wake.clear()
+
+    def _launch(self, broadcast_id: ObjectId) -> None:
+        with self._lock:
+            if broadcast_id in self._running:
+                return
+            self._running.add(broadcast_id)
+        threading.Thread(target=self._run, args=(broadcast_id,), name="broadcast", daemon=True).start()
+
+    def _run(self, broadcast_id: ObjectId) -> None:
+        try:
+            self._drain(broadcast_id)
+        except Exception as exc:
+            logger.exception("Broadcast %s failed", broadcast_id)
+            self.repo.finish(broadcast_id, self.owner, "failed", error=str(exc)[:500])
+        finally:
+            # No-op unless we still hold it (stopped by shutdown)
+            self.repo.release(broadcast_id, self.owner)
+            with self._lock:
+                self._running.discard(broadcast_id)
+
+    def _drain(self, broadcast_id: ObjectId) -> None:
+        doc = self.repo.get(broadcast_id)
+        if doc is None:
+            return
+        text = doc["text"]
+        last_id = doc.get("last_id")
+        while not self._stop.is_set():
+            if not self.repo.renew(broadcast_id, self.owner, self.lease_seconds):
+                return
+            batch = self.users.broadcast_batch(last_id, self.batch_size)
+            if not batch:
+                self.repo.finish(broadcast_id, self.owner, "done")
+                return
+            results = list(self._pool.map(lambda u: self._send(u["id"], text), batch))
+            advanced = self.repo.advance(
+                broadcast_id,
+                last_id,
+                batch[-1]["_id"],
+                sent=results.count("sent"),
+                failed=results.count("failed"),
+                blocked=results.count("blocked"),
+            )
+            if not advanced:
+                return
+            last_id = batch[-1]["_id"]
+
+    def _send(self, user_id: int, text: str) -> str:
+        try:
+            with bulk_priority():
+                self.bot.send_message(user_id, text)
+            return "sent"
+        except ApiTelegramException as exc:
+            # 403: blocked by the user or the account was deactivated
+            if exc.error_code == 403:
+                self.users.set_blocked(user_id)
+                return "blocked"
+            return "failed"
+        except Exception:
+            return "failed"
+
+
+def parse_broadcast_id(value: str) -> ObjectId | None:
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+
+def format_status(doc: Dict[str, Any]) -> str:
+    text = (
+        f"Broadcast {doc['_id']}: {doc['status']}\n"
+        f"Sent: {doc.get('sent', 0)}\nFailed: {doc.get('failed', 0)}\nBlocked: {doc.get('blocked', 0)}"
+    )
+    if doc.get("error"):
+        text += f"\nError: {doc['error']}"
+    return text
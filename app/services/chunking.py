@@ -0,0 +1,92 @@
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List
+
+
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+")
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _pieces(text: str, max_chars: int) -> List[str]:
+    # Paragraphs first, then sentences, then a hard cut for run-on text
+    out: List[str] = []
+    for para in _PARAGRAPHS.split(text):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            out.append(para)
+            continue
+        for sentence in _SENTENCES.split(para):
+            sentence = sentence.strip()
+            while len(sentence) > max_chars:
+                out.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if sentence:
+                out.append(sentence)
+    return out
+
+
+def split_note(note: str, max_chars: int, max_chunks: int | None = None) -> List[str]:
+    """Split on paragraph/sentence boundaries into chunks of about max_chars.
+
+    With max_chunks, the shortest neighbouring pair is merged until there are at
+    most that many, so no part of the note is left without questions.
+    """
+    chunks: List[str] = []
+    current = ""
+    for piece in _pieces(note or "", max(1, max_chars)):
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            if current:
+                chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    if max_chunks is not None:
+        while len(chunks) > max(1, max_chunks):
+            i = min(range(len(chunks) - 1), key=lambda j: len(chunks[j]) + len(chunks[j + 1]))
+            chunks[i : i + 2] = [f"{chunks[i]}\n\n{chunks[i + 1]}"]
+    return chunks
+
+
+def allocate(total: int, sizes: List[int], minimum: int = 0) -> List[int]:
+    """Split total across chunks in proportion to their size (largest remainder).
+
+    Each chunk gets at least `minimum` when total allows it.
+    """
+    if minimum and total >= minimum * len(sizes):
+        rest = allocate(total - minimum * len(sizes), sizes)
+        return [minimum + n for n in rest]
+    weight = sum(sizes)
+    if not sizes or weight <= 0:
+        return [0 for _ in sizes]
+    exact = [total * s / weight for s in sizes]
+    counts = [int(x) for x in exact]
+    by_remainder = sorted(range(len(sizes)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_remainder[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def question_key(question: Dict) -> str:
+    return _NON_WORD.sub(" ", (question.get("question") or "").lower()).strip()
+
+
+def is_near_duplicate(question: Dict, seen: List[str], threshold: float = 0.85) -> bool:
+    text = question_key(question)
+    return any(SequenceMatcher(None, text, other).ratio() >= threshold for other in seen)
+
+
+def dedupe_questions(questions: List[Dict], threshold: float = 0.85) -> List[Dict]:
+    seen: List[str] = []
+    out: List[Dict] = []
+    for q in questions:
+        if is_near_duplicate(q, seen, threshold):
+            continue
+        seen.append(question_key(q))
+        out.append(q)
+    return out
@@ -0,0 +1,105 @@
+import atexit
+import logging
+import threading
+from typing import Dict, List, Tuple
+from pymongo import UpdateOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+from ..config import get_config
+
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Write-behind $inc counters on users (e.g. total_notes).
+
+    Only for counters nobody makes decisions on: increments sit in memory until
+    max_pending users are buffered or flush_seconds pass, then go out as one
+    unordered bulk_write. Anything quota-related stays on the atomic path.
+    """
+
+    def __init__(self, db: Database, max_pending: int = 500, flush_seconds: float = 10.0) -> None:
+        self.collection = db["users"]
+        self.max_pending = max(1, max_pending)
+        self.flush_seconds = max(0.1, flush_seconds)
+        self._pending: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="counter-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    def incr(self, user_id: int, field: str, amount: int = 1) -> None:
+        with self._lock:
+            key = (user_id, field)
+            self._pending[key] = self._pending.get(key, 0) + amount
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def flush(self) -> int:
+        """Write out buffered increments; returns how many users were updated.
+
+        Never raises: it runs inside delivery callbacks via incr(). Increments
+        that did not reach the database stay buffered for the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            by_user: Dict[int, Dict[str, int]] = {}
+            for (user_id, field), amount in pending.items():
+                by_user.setdefault(user_id, {})[field] = amount
+            users = list(by_user)
+            ops = [UpdateOne({"id": uid}, {"$inc": by_user[uid]}) for uid in users]
+            try:
+                self.collection.bulk_write(ops, ordered=False)
+            except BulkWriteError as exc:
+                # Unordered: everything but the reported ops was applied
+                failed = [users[err["index"]] for err in exc.details.get("writeErrors", [])]
+                self._restore(failed, by_user)
+                logger.warning("Counter flush: %d of %d updates failed, kept for retry", len(failed), len(ops))
+                return len(ops) - len(failed)
+            except Exception:
+                self._restore(users, by_user)
+                logger.exception("Counter flush failed, %d updates kept for retry", len(ops))
+                return 0
+            return len(ops)
+
+    def _restore(self, users: List[int], by_user: Dict[int, Dict[str, int]]) -> None:
+        with self._lock:
+            for user_id in users:
+                for field, amount in by_user[user_id].items():
+                    key = (user_id, field)
+                    self._pending[key] = self._pending.get(key, 0) + amount
+
+
+_buffer: CounterBuffer | None = None
+_buffer_lock = threading.Lock()
+
+
+def get_counter_buffer(db: Database) -> CounterBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                cfg = get_config()
+                _buffer = CounterBuffer(db, cfg.counter_flush_size, cfg.counter_flush_seconds)
+                _buffer.start()
+    return _buffer
@@ -0,0 +1,204 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from telebot import TeleBot
+from .outbound import BULK, OutboundLimiter, bulk_priority, prepaid
+
+
+def text_item(text: str, parse_mode: str | None = None) -> Dict[str, Any]:
+    return {"kind": "text", "text": text, "parse_mode": parse_mode}
+
+
+def poll_item(q: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "kind": "poll",
+        "question": q["question"],
+        "choices": q["choices"],
+        "answer_index": q["answer_index"],
+        "explanation": (q.get("explanation") or "")[:195],
+    }
+
+
+class QuizDelivery:
+    """One quiz in flight: the rendered items, how far sending got, and whether more are coming."""
+
+    def __init__(
+        self,
+        target: Any,
+        delay_seconds: float,
+        on_done: Optional[Callable[["QuizDelivery"], None]] = None,
+    ) -> None:
+        self.target = target
+        self.items: List[Dict[str, Any]] = []
+        self.delay_seconds = delay_seconds
+        self.on_done = on_done
+        self.sent = 0
+        self.error: Exception | None = None
+        self.closed = False
+        self.finished = False
+        self.scheduled = False
+        self.next_due = time.monotonic() + delay_seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 0 < self.sent == len(self.items)
+
+
+class DeliveryEngine:
+    """Delayed-send queue for quizzes.
+
+    Quizzes are handed over already rendered and the caller returns immediately.
+    A single timer thread keeps a heap of (due, quiz) entries and hands each due
+    send to a small worker pool, so waiting between questions costs no thread.
+    Items can also be fed one at a time while a quiz is still being generated.
+    A send whose chat is over its rate limit goes back on the heap for when the
+    limiter allows it, so a slow group chat never holds a worker.
+    """
+
+    def __init__(self, bot: TeleBot, workers: int = 4) -> None:
+        self.bot = bot
+        self.limiter: OutboundLimiter | None = getattr(bot, "limiter", None)
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="delivery")
+        self._thread: threading.Thread | None = None
+        self._running = False
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="delivery-timer", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._pool.shutdown(wait=False)
+
+    def in_flight(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def submit(
+        self,
+        target: Any,
+        items: List[Dict[str, Any]],
+        delay_seconds: float,
+        on_done: Optional[Callable[[QuizDelivery], None]] = None,
+    ) -> QuizDelivery:
+        job = self.open(target, delay_seconds, on_done)
+        for item in items:
+            self.feed(job, item)
+        self.close(job)
+        return job
+
+    def open(
+        self,
+        target: Any,
+        delay_seconds: float,
+        on_done: Optional[Callable[[QuizDelivery], None]] = None,
+    ) -> QuizDelivery:
+        return QuizDelivery(target, max(0.0, float(delay_seconds)), on_done)
+
+    def feed(self, job: QuizDelivery, item: Dict[str, Any]) -> None:
+        with self._cond:
+            if job.closed:
+                return
+            job.items.append(item)
+            if not job.scheduled:
+                self._push(job, max(time.monotonic(), job.next_due))
+
+    def close(self, job: QuizDelivery, error: Exception | None = None) -> None:
+        # An error means generation stopped early: items already fed still go out, but the job is not ok
+        with self._cond:
+            job.closed = True
+            if error is not None and job.error is None:
+                job.error = error
+            idle = not job.scheduled and job.sent == len(job.items)
+        if idle:
+            self._finish(job)
+
+    def _push(self, job: QuizDelivery, due: float) -> None:
+        # Caller holds self._cond
+        job.scheduled = True
+        heapq.heappush(self._heap, (due, next(self._seq), job))
+        if self._heap[0][2] is job:
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                due, _, job = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+                heapq.heappop(self._heap)
+            self._pool.submit(self._send_next, job)
+
+    def _send_next(self, job: QuizDelivery) -> None:
+        if self.limiter is not None:
+            wait = self.limiter.try_acquire(job.target, BULK)
+            if wait > 0:
+                with self._cond:
+                    self._push(job, time.monotonic() + wait)
+                return
+        try:
+            self._send(job.target, job.items[job.sent])
+        except Exception as exc:
+            with self._cond:
+                job.error = exc
+                job.closed = True
+                job.scheduled = False
+            self._finish(job)
+            return
+        with self._cond:
+            job.sent += 1
+            job.next_due = time.monotonic() + job.delay_seconds
+            job.scheduled = False
+            if job.sent < len(job.items):
+                self._push(job, job.next_due)
+                return
+            if not job.closed:
+                # Waiting for the generator to feed the next question
+                return
+        self._finish(job)
+
+    def _send(self, target: Any, item: Dict[str, Any]) -> None:
+        # Quiz delivery is bulk traffic; replies to users go ahead of it. The token was
+        # already taken in _send_next, so the bot must not wait for another one
+        with bulk_priority(), prepaid():
+            if item["kind"] == "poll":
+                self.bot.send_poll(
+                    target,
+                    item["question"],
+                    item["choices"],
+                    type="quiz",
+                    correct_option_id=item["answer_index"],
+                    explanation=item["explanation"],
+                )
+            else:
+                self.bot.send_message(target, item["text"], parse_mode=item.get("parse_mode"))
+
+    def _finish(self, job: QuizDelivery) -> None:
+        with self._cond:
+            if job.finished:
+                return
+            job.finished = True
+        if job.on_done is None:
+            return
+        try:
+            job.on_done(job)
+        except Exception:
+            pass
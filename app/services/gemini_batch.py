@@ -0,0 +1,147 @@
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from ..config import get_config
+from .gemini import PROMPT_VERSION, build_batch_prompt, generate_questions, is_long_note, parse_batch_response
+from .gemini_client import get_client
+from .quiz_cache import get_cache, make_key
+
+
+class _Request:
+    __slots__ = ("note", "num_questions", "key", "done", "result")
+
+    def __init__(self, note: str, num_questions: int, key: str) -> None:
+        self.note = note
+        self.num_questions = num_questions
+        self.key = key
+        self.done = threading.Event()
+        self.result: List[Dict] = []
+
+
+class BatchGenerator:
+    """Coalesces generation requests that arrive close together.
+
+    Identical notes already in flight share one result (single-flight). Distinct
+    notes collected within the window go out as one multi-note prompt and the
+    structured answer is split back per caller. Notes the model skipped fall
+    back to a single-note call.
+    """
+
+    def __init__(self, window_seconds: float = 0.2, max_batch: int = 5, timeout_seconds: float = 300) -> None:
+        self.window_seconds = max(0.0, window_seconds)
+        self.max_batch = max(1, max_batch)
+        self.timeout_seconds = timeout_seconds
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Request] = {}
+        self._pending: List[_Request] = []
+        self._timer: threading.Timer | None = None
+        self._pool = ThreadPoolExecutor(max_workers=self.max_batch, thread_name_prefix="gemini-batch")
+        self.calls = 0
+        self.coalesced = 0
+
+    def generate(self, note: str, num_questions: int = 5, fresh: bool = False) -> List[Dict]:
+        # Long notes are already split into parallel calls; they do not fit a shared prompt
+        if fresh or not get_config().gemini_api_key or is_long_note(note):
+            return generate_questions(note, num_questions, fresh=fresh)
+
+        key = make_key(note, num_questions, PROMPT_VERSION)
+        cached = get_cache().get(key)
+        if cached:
+            return cached
+
+        batch: List[_Request] | None = None
+        with self._lock:
+            req = self._inflight.get(key)
+            if req is not None:
+                self.coalesced += 1
+            else:
+                req = _Request(note, num_questions, key)
+                self._inflight[key] = req
+                self._pending.append(req)
+                if len(self._pending) >= self.max_batch:
+                    batch = self._take_batch()
+                elif self._timer is None:
+                    self._timer = threading.Timer(self.window_seconds, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self._pool.submit(self._run_batch, batch)
+
+        req.done.wait(self.timeout_seconds)
+        return copy.deepcopy(req.result)
+
+    def _take_batch(self) -> List[_Request]:
+        batch = self._pending[: self.max_batch]
+        self._pending = self._pending[self.max_batch :]
+        if not self._pending and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            self._timer = None
+            batches = []
+            while self._pending:
+                batches.append(self._take_batch())
+        for batch in batches:
+            self._pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[_Request]) -> None:
+        fallback: List[_Request] = []
+        try:
+            results: List[List[Dict]] = [[] for _ in batch]
+            if len(batch) > 1:
+                try:
+                    with self._lock:
+                        self.calls += 1
+                    raw = get_client().generate(build_batch_prompt([(r.note, r.num_questions) for r in batch]))
+                    results = parse_batch_response(raw, len(batch))
+                except Exception:
+                    pass
+            cache = get_cache()
+            for req, questions in zip(batch, results):
+                if questions:
+                    cache.put(req.key, questions)
+                    req.result = questions
+                else:
+                    fallback.append(req)
+        finally:
+            self._complete([req for req in batch if req not in fallback])
+        # Notes the batch missed go out as parallel single-note calls; each caller wakes on its own
+        for req in fallback:
+            self._pool.submit(self._run_single, req)
+
+    def _run_single(self, req: _Request) -> None:
+        try:
+            with self._lock:
+                self.calls += 1
+            req.result = generate_questions(req.note, req.num_questions, fresh=True)
+        finally:
+            self._complete([req])
+
+    def _complete(self, reqs: List[_Request]) -> None:
+        with self._lock:
+            for req in reqs:
+                self._inflight.pop(req.key, None)
+        for req in reqs:
+            req.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "pending": len(self._pending)}
+
+
+_batcher: BatchGenerator | None = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> BatchGenerator:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                cfg = get_config()
+                _batcher = BatchGenerator(cfg.gemini_batch_window_ms / 1000.0, cfg.gemini_batch_max)
+    return _batcher
@@ -0,0 +1,161 @@
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator
+import requests
+from requests.adapters import HTTPAdapter
+from ..config import get_config
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GeminiError(RuntimeError):
+    pass
+
+
+def _retry_after_seconds(response: requests.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        if when.tzinfo is None:
+            # "-0000" and zone-less dates parse naive; HTTP dates are always UTC
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        # Unparseable header: fall back to the default backoff
+        return None
+
+
+class GeminiClient:
+    """Shared keep-alive client for the Gemini REST API with retries and a concurrency cap."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        pool_size: int = 16,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        max_concurrency: int = 8,
+    ) -> None:
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "x-goog-api-key": api_key})
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+
+    def url(self, method: str = "generateContent") -> str:
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    def generate(self, prompt: str) -> str:
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        data = self.post(self.url(), payload).json()
+        try:
+            return data["candidates"][0]["content"]["parts"][0]["text"]
+        except (KeyError, IndexError, TypeError) as exc:
+            raise GeminiError(f"Unexpected Gemini response: {exc}")
+
+    def stream_generate(self, prompt: str) -> Iterator[str]:
+        # Retries only cover the request itself; once text is flowing a failure ends the stream.
+        # The concurrency slot stays taken until the body is read or the generator is closed.
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        response = self.post(self.url("streamGenerateContent"), payload, hold_slot=True, params={"alt": "sse"}, stream=True)
+        try:
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    try:
+                        event = json.loads(line[5:].strip())
+                        parts = event["candidates"][0]["content"]["parts"]
+                    except (ValueError, KeyError, IndexError, TypeError):
+                        continue
+                    for part in parts:
+                        text = part.get("text")
+                        if text:
+                            yield text
+        except requests.RequestException as exc:
+            raise GeminiError(f"Gemini stream interrupted: {exc}")
+        finally:
+            self._slots.release()
+
+    def post(self, url: str, payload: Dict[str, Any], hold_slot: bool = False, **kwargs: Any) -> requests.Response:
+        """POST with retries. With hold_slot the concurrency slot stays taken after a
+        successful return and the caller releases it once the body is consumed."""
+        attempt = 0
+        while True:
+            wait: float | None = None
+            held = False
+            self._slots.acquire()
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRY_STATUSES:
+                    try:
+                        response.raise_for_status()
+                    except requests.HTTPError:
+                        response.close()
+                        raise
+                    held = hold_slot
+                    return response
+                wait = _retry_after_seconds(response)
+                error: Exception = GeminiError(f"Gemini returned {response.status_code}")
+                response.close()
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                error = exc
+            except requests.HTTPError as exc:
+                raise GeminiError(str(exc))
+            finally:
+                if not held:
+                    self._slots.release()
+
+            if attempt >= self.max_retries:
+                raise GeminiError(f"Gemini request failed after {attempt + 1} attempts: {error}")
+            if wait is None:
+                # Full jitter keeps concurrent callers from retrying in lockstep
+                wait = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            time.sleep(min(wait, self.backoff_max))
+            attempt += 1
+
+_client: GeminiClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GeminiClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                cfg = get_config()
+                _client = GeminiClient(
+                    api_key=cfg.gemini_api_key,
+                    base_url=cfg.gemini_api_url,
+                    model=cfg.gemini_model,
+                    pool_size=cfg.gemini_pool_size,
+                    connect_timeout=cfg.gemini_connect_timeout,
+                    read_timeout=cfg.gemini_read_timeout,
+                    max_retries=cfg.gemini_max_retries,
+                    max_concurrency=cfg.gemini_max_concurrency,
+                )
+    return _client
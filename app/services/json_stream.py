@@ -0,0 +1,55 @@
+import json
+from typing import Any, Iterator, List
+
+
+class JsonArrayStreamParser:
+    """Incrementally pulls the objects out of a JSON array as text arrives.
+
+    Anything before the opening bracket (such as a ```json fence) is skipped. Each
+    top-level object is decoded as soon as its closing brace is seen.
+    """
+
+    def __init__(self) -> None:
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buf: List[str] = []
+
+    def feed(self, text: str) -> Iterator[Any]:
+        for ch in text:
+            if self._done:
+                return
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = [ch]
+                elif ch == "]":
+                    self._done = True
+                continue
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._buf)
+                    self._buf = []
+                    try:
+                        yield json.loads(raw)
+                    except ValueError:
+                        continue
@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from telebot import TeleBot
+from ..config import get_config
+
+
+MEMBER_STATUSES = ("member", "administrator", "creator")
+
+
+def channel_key(channel: object) -> str:
+    return str(channel).strip().lower()
+
+
+class MembershipCache:
+    """Force-subscription results per (user, channel).
+
+    Joins are sticky, so positive answers live much longer than negative ones;
+    a user who just joined only waits for the short negative TTL.
+    """
+
+    def __init__(self, positive_ttl: float = 600, negative_ttl: float = 30, max_entries: int = 50000) -> None:
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[int, str], Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, channel: object) -> Optional[bool]:
+        key = (user_id, channel_key(channel))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            is_member, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            return is_member
+
+    def put(self, user_id: int, channel: object, is_member: bool) -> None:
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[(user_id, channel_key(channel))] = (is_member, time.monotonic() + ttl)
+
+    def invalidate(self, user_id: int, channels: List[object]) -> None:
+        with self._lock:
+            for channel in channels:
+                self._entries.pop((user_id, channel_key(channel)), None)
+
+
+_cache: MembershipCache | None = None
+_pool: ThreadPoolExecutor | None = None
+_init_lock = threading.Lock()
+
+
+def get_membership_cache() -> MembershipCache:
+    global _cache, _pool
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                cfg = get_config()
+                _pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="membership")
+                _cache = MembershipCache(cfg.membership_positive_ttl, cfg.membership_negative_ttl)
+    return _cache
+
+
+def _lookup(bot: TeleBot, user_id: int, channel: str) -> bool:
+    cache = get_membership_cache()
+    try:
+        is_member = bot.get_chat_member(channel, user_id).status in MEMBER_STATUSES
+    except Exception:
+        # Errors (bot removed, channel renamed) are not cached so a fix shows up right away
+        return False
+    cache.put(user_id, channel, is_member)
+    return is_member
+
+
+def is_member_of_all(bot: TeleBot, user_id: int, channels: List[str]) -> bool:
+    cache = get_membership_cache()
+    missing = []
+    for channel in channels:
+        cached = cache.get(user_id, channel)
+        if cached is False:
+            return False
+        if cached is None:
+            missing.append(channel)
+    if not missing:
+        return True
+    if len(missing) == 1:
+        return _lookup(bot, user_id, missing[0])
+    assert _pool is not None
+    futures = [_pool.submit(_lookup, bot, user_id, channel) for channel in missing]
+    return all(f.result() for f in futures)
+
+
+def on_chat_member_update(user_id: int, chat_id: int, username: str | None, status: str) -> None:
+    cache = get_membership_cache()
+    is_member = status in MEMBER_STATUSES
+    keys: List[object] = [chat_id]
+    if username:
+        keys.append(f"@{username}")
+    for key in keys:
+        cache.put(user_id, key, is_member)
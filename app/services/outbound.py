@@ -0,0 +1,169 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+
+
+INTERACTIVE = 0
+BULK = 1
+
+_local = threading.local()
+
+
+@contextmanager
+def bulk_priority() -> Iterator[None]:
+    """Sends made inside this block (quiz delivery, broadcasts) yield to interactive replies."""
+    previous = getattr(_local, "priority", INTERACTIVE)
+    _local.priority = BULK
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def current_priority() -> int:
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+@contextmanager
+def prepaid() -> Iterator[None]:
+    """The caller already took a send token with try_acquire(); the next send inside this block skips acquire()."""
+    _local.prepaid = True
+    try:
+        yield
+    finally:
+        _local.prepaid = False
+
+
+def _take_prepaid() -> bool:
+    if getattr(_local, "prepaid", False):
+        _local.prepaid = False
+        return True
+    return False
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        # Seconds until `amount` tokens are available; assumes refill() was just called
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class OutboundLimiter:
+    """Token buckets matching Telegram's send limits.
+
+    Global messages per second, one message per second per private chat and a
+    per-minute budget per group or channel. Bulk sends may not dip into the last
+    `bulk_reserve` share of the global bucket, which keeps room for replies to users.
+    """
+
+    def __init__(
+        self,
+        global_per_second: float = 30,
+        private_per_second: float = 1,
+        group_per_minute: float = 20,
+        bulk_reserve: float = 0.3,
+        max_chats: int = 10000,
+    ) -> None:
+        self.global_bucket = TokenBucket(global_per_second, global_per_second)
+        self.private_per_second = private_per_second
+        self.group_per_minute = group_per_minute
+        self.bulk_floor = global_per_second * bulk_reserve
+        self.max_chats = max_chats
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _chat_bucket(self, chat_id: Any, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                # Drop chats that have fully refilled; they carry no state worth keeping
+                for key, b in list(self._chats.items()):
+                    b.refill(now)
+                    if b.tokens >= b.capacity:
+                        del self._chats[key]
+            is_group = isinstance(chat_id, str) or int(chat_id) < 0
+            if is_group:
+                bucket = TokenBucket(self.group_per_minute / 60.0, 3)
+            else:
+                bucket = TokenBucket(self.private_per_second, 1)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def try_acquire(self, chat_id: Any, priority: int = INTERACTIVE) -> float:
+        """Take a send token if one is free and return 0; otherwise return the seconds to wait."""
+        floor = self.bulk_floor if priority == BULK else 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.global_bucket.refill(now)
+            chat = self._chat_bucket(chat_id, now)
+            chat.refill(now)
+            wait = max(self.global_bucket.wait_for(1 + floor), chat.wait_for(1))
+            if wait <= 0:
+                self.global_bucket.tokens -= 1
+                chat.tokens -= 1
+                return 0.0
+            return wait
+
+    def acquire(self, chat_id: Any, priority: int = INTERACTIVE) -> None:
+        while True:
+            wait = self.try_acquire(chat_id, priority)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 5.0))
+
+    def penalize(self, chat_id: Any, seconds: float) -> None:
+        # After a 429 the chat is blocked for retry_after seconds
+        with self._lock:
+            now = time.monotonic()
+            chat = self._chat_bucket(chat_id, now)
+            chat.refill(now)
+            chat.tokens = min(chat.tokens, 1.0) - seconds * chat.rate
+
+
+class RateLimitedBot(TeleBot):
+    """TeleBot whose outgoing messages pass through an OutboundLimiter and retry 429s."""
+
+    def __init__(self, token: str, *args: Any, limiter: OutboundLimiter | None = None, max_retries: int = 3, **kwargs: Any) -> None:
+        super().__init__(token, *args, **kwargs)
+        self.limiter = limiter or OutboundLimiter()
+        self.max_retries = max_retries
+
+    def _limited(self, chat_id: Any, send: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        attempt = 0
+        while True:
+            # Retries after a 429 always wait for a fresh token
+            if not (attempt == 0 and _take_prepaid()):
+                self.limiter.acquire(chat_id, current_priority())
+            try:
+                return send(*args, **kwargs)
+            except ApiTelegramException as exc:
+                if exc.error_code != 429 or attempt >= self.max_retries:
+                    raise
+                retry_after = float((exc.result_json.get("parameters") or {}).get("retry_after", 1))
+                self.limiter.penalize(chat_id, retry_after)
+                attempt += 1
+
+    def send_message(self, chat_id, text, *args, **kwargs):
+        return self._limited(chat_id, super().send_message, chat_id, text, *args, **kwargs)
+
+    def send_poll(self, chat_id, question, options, *args, **kwargs):
+        return self._limited(chat_id, super().send_poll, chat_id, question, options, *args, **kwargs)
+
+    def send_photo(self, chat_id, photo, *args, **kwargs):
+        return self._limited(chat_id, super().send_photo, chat_id, photo, *args, **kwargs)
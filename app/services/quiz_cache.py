@@ -0,0 +1,109 @@
+import copy
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo.collection import Collection
+from ..config import get_config
+from ..db import get_db
+
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_note(note: str) -> str:
+    return _WS.sub(" ", (note or "").strip())
+
+
+def make_key(note: str, num_questions: int, prompt_version: str) -> str:
+    raw = f"{prompt_version}\x00{int(num_questions)}\x00{normalize_note(note)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QuizCache:
+    """Generated questions keyed by note hash: an in-process LRU in front of the quiz_cache collection.
+
+    Mongo expires entries through the TTL index on created_at (see init_db).
+    """
+
+    def __init__(self, max_entries: int = 512) -> None:
+        self.max_entries = max(1, max_entries)
+        self._lru: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _collection(self) -> Optional[Collection]:
+        try:
+            return get_db()["quiz_cache"]
+        except Exception:
+            return None
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._lru[key])
+        coll = self._collection()
+        doc = None
+        if coll is not None:
+            try:
+                doc = coll.find_one({"_id": key}, {"questions": 1})
+            except Exception:
+                doc = None
+        with self._lock:
+            if not doc or not doc.get("questions"):
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self._remember(key, doc["questions"])
+        return copy.deepcopy(doc["questions"])
+
+    def put(self, key: str, questions: List[Dict[str, Any]]) -> None:
+        if not questions:
+            return
+        with self._lock:
+            self._remember(key, copy.deepcopy(questions))
+        coll = self._collection()
+        if coll is None:
+            return
+        try:
+            coll.update_one(
+                {"_id": key},
+                {"$set": {"questions": questions, "created_at": datetime.utcnow()}},
+                upsert=True,
+            )
+        except Exception:
+            pass
+
+    def _remember(self, key: str, questions: List[Dict[str, Any]]) -> None:
+        self._lru[key] = questions
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._lru),
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+            }
+
+
+_cache: QuizCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> QuizCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QuizCache(get_config().quiz_cache_size)
+    return _cache
@@ -1,46 +1,64 @@
 from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
 from pymongo.database import Database
-from ..config import get_config
 from ..repositories.users import UsersRepository
+from .counters import get_counter_buffer
+from .settings_service import SettingsService
 
 
 def is_premium(user_doc: dict) -> bool:
     return (user_doc or {}).get("type") == "premium"
 
 
-def has_quota(db: Database, user_id: int) -> bool:
-    cfg = get_config()
-    users_repo = UsersRepository(db)
-    user = users_repo.get(user_id) or {}
-    max_notes = cfg.max_notes_premium if is_premium(user) else cfg.max_notes_regular
-    return int(user.get("notes_today", 0)) < int(max_notes)
+def today(now: datetime | None = None) -> str:
+    return (now or datetime.utcnow()).strftime("%Y-%m-%d")
 
 
-def increment_quota(db: Database, user_id: int) -> None:
-    UsersRepository(db).bump_notes_today(user_id)
+def note_limits(db: Database) -> tuple[int, int]:
+    ss = SettingsService(db)
+    return ss.get_int("max_notes_regular"), ss.get_int("max_notes_premium")
+
+
+def note_cooldown(db: Database) -> int:
+    return SettingsService(db).get_int("note_cooldown_seconds")
+
+
+def notes_used_today(user: dict) -> int:
+    if (user or {}).get("notes_day") != today():
+        return 0
+    return int(user.get("notes_today", 0) or 0)
+
+
+def has_quota(db: Database, user_id: int, user: dict | None = None) -> bool:
+    if user is None:
+        user = UsersRepository(db).get(user_id) or {}
+    regular, premium = note_limits(db)
+    max_notes = premium if is_premium(user) else regular
+    return notes_used_today(user) < int(max_notes)
 
 
 def increase_total_notes(db: Database, user_id: int) -> None:
-    UsersRepository(db).bump_total_notes(user_id)
+    # Display-only counter: batched instead of one write per delivered note
+    get_counter_buffer(db).incr(user_id, "total_notes")
 
 
-def can_submit_note_now(db: Database, user_id: int, cooldown_seconds: int = 10) -> bool:
-    users_repo = UsersRepository(db)
-    user = users_repo.get(user_id) or {}
+def can_submit_note_now(db: Database, user_id: int, cooldown_seconds: int | None = None, user: dict | None = None) -> bool:
+    if user is None:
+        user = UsersRepository(db).get(user_id) or {}
+    if cooldown_seconds is None:
+        cooldown_seconds = note_cooldown(db)
     last = user.get("last_note_time")
-    if not last:
+    if not isinstance(last, datetime):
         return True
-    if isinstance(last, str):
-        try:
-            last = datetime.fromisoformat(last)
-        except Exception:
-            return True
     return datetime.utcnow() - last >= timedelta(seconds=cooldown_seconds)
 
 
-def update_last_note_time(db: Database, user_id: int) -> None:
-    UsersRepository(db).set_last_note_time(user_id)
+def admit_note(db: Database, user_id: int) -> Optional[Dict[str, Any]]:
+    """Atomically take one of today's note slots; None if over the limit or still cooling down."""
+    regular, premium = note_limits(db)
+    return UsersRepository(db).admit_note(user_id, today(), regular, premium, note_cooldown(db))
 
 
-def reset_notes_if_new_day(db: Database, user_id: int) -> None:
-    UsersRepository(db).reset_notes_if_new_day(user_id)
\ No newline at end of file
+def release_note(db: Database, user_id: int, day: str) -> None:
+    """Give back a slot taken by admit_note when nothing was delivered."""
+    UsersRepository(db).release_note(user_id, day)
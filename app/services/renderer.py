@@ -0,0 +1,121 @@
+from functools import lru_cache
+from html import escape
+from typing import Any, Dict, Iterable, Iterator, List
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+from .delivery import poll_item, text_item
+
+
+MAX_MESSAGE_CHARS = 4096
+BUNDLE_SEPARATOR = "\n\n"
+_LETTERS = "ABCD"
+
+# Longest a single choice may render; the question stem gets whatever room is left
+_MAX_CHOICE_CHARS = 500
+
+# Formatted once per question part
+_QUESTION = "{idx}. {question}\n"
+_CHOICE = "{label}. {choice}\n"
+_ANSWER = "\n<b>Correct Answer</b>: {label} - {choice}"
+_EXPLANATION = "\n<b>Explanation:</b> {explanation}"
+
+
+def _label(i: int) -> str:
+    return _LETTERS[i] if i < len(_LETTERS) else str(i + 1)
+
+
+def _clip(text: str, limit: int) -> str:
+    """HTML-escape `text`, cut so the escaped result is at most `limit` characters."""
+    escaped = escape(text)
+    if len(escaped) <= limit:
+        return escaped
+    # Cut on source characters so an entity like &amp; is never split
+    parts: List[str] = []
+    size = 0
+    for ch in text:
+        piece = escape(ch)
+        if size + len(piece) > limit - 1:
+            break
+        parts.append(piece)
+        size += len(piece)
+    return "".join(parts) + "…"
+
+
+def render_text(idx: int, q: Dict[str, Any]) -> str:
+    """One question as an HTML message, shortened if needed to fit in a single message."""
+    choices = q["choices"]
+    answer = q["answer_index"]
+    choice_room = min(_MAX_CHOICE_CHARS, MAX_MESSAGE_CHARS // 2 // (len(choices) + 1))
+    tail = [_CHOICE.format(label=_label(i), choice=_clip(c, choice_room)) for i, c in enumerate(choices)]
+    tail.append(_ANSWER.format(label=_label(answer), choice=_clip(choices[answer], choice_room)))
+    explanation = q.get("explanation") or ""
+    if explanation:
+        tail.append(_EXPLANATION.format(explanation=escape(explanation[:195])))
+    room = MAX_MESSAGE_CHARS - sum(map(len, tail)) - len(_QUESTION.format(idx=idx, question=""))
+    return _QUESTION.format(idx=idx, question=_clip(q["question"], room)) + "".join(tail)
+
+
+def render_quiz(questions: Iterable[Dict[str, Any]], qtype: str, bundle: bool = False) -> Iterator[Dict[str, Any]]:
+    """Delivery items for a quiz, yielded as soon as each is ready (works with streamed questions).
+
+    Polls are always one per question. With `bundle`, consecutive text questions are
+    packed into as few messages as fit under Telegram's 4096-character limit.
+    """
+    if qtype != "text":
+        for q in questions:
+            yield poll_item(q)
+        return
+    pending: List[str] = []
+    size = 0
+    for idx, q in enumerate(questions, start=1):
+        text = render_text(idx, q)
+        if not bundle:
+            yield text_item(text, parse_mode="HTML")
+            continue
+        added = len(text) + (len(BUNDLE_SEPARATOR) if pending else 0)
+        if pending and size + added > MAX_MESSAGE_CHARS:
+            yield text_item(BUNDLE_SEPARATOR.join(pending), parse_mode="HTML")
+            pending, size, added = [], 0, len(text)
+        pending.append(text)
+        size += added
+    if pending:
+        yield text_item(BUNDLE_SEPARATOR.join(pending), parse_mode="HTML")
+
+
+class StaticKeyboard(InlineKeyboardMarkup):
+    """A keyboard that never changes after it is built; its JSON is serialized once."""
+
+    _json: str | None = None
+
+    def to_json(self) -> str:
+        if self._json is None:
+            self._json = super().to_json()
+        return self._json
+
+
+@lru_cache(maxsize=None)
+def main_menu() -> InlineKeyboardMarkup:
+    kb = StaticKeyboard()
+    kb.row(
+        InlineKeyboardButton("📝 Generate", callback_data="generate"),
+        InlineKeyboardButton("👤 Profile", callback_data="profile"),
+    )
+    kb.row(
+        InlineKeyboardButton("📢 My Channels", callback_data="channels"),
+        InlineKeyboardButton("⏰ Schedule", callback_data="schedule_menu"),
+    )
+    kb.row(
+        InlineKeyboardButton("ℹ️ About", callback_data="about"),
+        InlineKeyboardButton("🆘 FAQs", callback_data="faq"),
+    )
+    kb.row(
+        InlineKeyboardButton("⚙️ Settings", callback_data="settings"),
+        InlineKeyboardButton("👨‍💻 Developer", url="https://t.me/Bek_i"),
+    )
+    return kb
+
+
+@lru_cache(maxsize=None)
+def home_keyboard() -> InlineKeyboardMarkup:
+    kb = StaticKeyboard()
+    kb.add(InlineKeyboardButton("🔙home", callback_data="home"))
+    return kb
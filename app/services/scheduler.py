@@ -1,66 +1,242 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError
 from telebot import TeleBot
-import time
 from pymongo.database import Database
-from ..services.gemini import generate_questions
+import os
+import socket
+import threading
+import uuid
+from typing import Any, Dict
+from ..repositories.schedules import SchedulesRepository, on_schedule_created
+from ..services.gemini import stream_questions
+from ..services.gemini_batch import get_batcher
+from ..services.delivery import DeliveryEngine, QuizDelivery
+from ..services.renderer import render_quiz
 
 
 class QuizScheduler:
-    def __init__(self, db: Database, bot: TeleBot) -> None:
+    def __init__(
+        self,
+        db: Database,
+        bot: TeleBot,
+        delivery: DeliveryEngine,
+        concurrency: int = 8,
+        lease_seconds: int = 60,
+        max_idle_seconds: int = 300,
+        change_stream: bool = False,
+        pregen_window_seconds: int = 3600,
+        pregen_concurrency: int = 4,
+        pregen_lease_seconds: int = 600,
+        streaming: bool = False,
+        bundle: bool = False,
+    ) -> None:
         self.db = db
         self.bot = bot
-        self.schedules = db["schedules"]
+        self.delivery = delivery
+        self.repo = SchedulesRepository(db)
         self.scheduler = BackgroundScheduler()
+        self.concurrency = max(1, concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="schedule")
+        self.lease_seconds = max(10, lease_seconds)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Schedules this replica holds a lease on, until delivery finishes
+        self._leased: set = set()
+        self._dispatching = 0
+        self._lock = threading.Lock()
+        # Without a change stream this is the only way to notice schedules inserted by other replicas
+        self.max_idle_seconds = max(1, max_idle_seconds)
+        self.change_stream = change_stream
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._next_at: datetime | None = None
+        # Questions are generated this far ahead so the due-time path only has to send
+        self.pregen_window_seconds = max(0, pregen_window_seconds)
+        self.pregen_concurrency = max(1, pregen_concurrency)
+        # Generation can outlast a delivery lease (retries, long notes, batch window), so pregen has its own
+        self.pregen_lease_seconds = max(self.lease_seconds, pregen_lease_seconds)
+        self.pregen_pool = ThreadPoolExecutor(max_workers=self.pregen_concurrency, thread_name_prefix="pregen")
+        self._pregenerating = 0
+        self.streaming = streaming
+        self.bundle = bundle
 
     def start(self) -> None:
-        self.scheduler.add_job(self._tick, IntervalTrigger(seconds=5), max_instances=1, coalesce=True)
+        on_schedule_created(self.notify)
+        self.scheduler.add_job(
+            self._heartbeat, IntervalTrigger(seconds=self.lease_seconds // 3), max_instances=1, coalesce=True
+        )
         self.scheduler.start()
+        threading.Thread(target=self._run, name="quiz-scheduler", daemon=True).start()
+        if self.change_stream:
+            threading.Thread(target=self._watch, name="quiz-scheduler-watch", daemon=True).start()
 
     def shutdown(self) -> None:
+        self._stop.set()
+        self._wake.set()
         if self.scheduler.running:
             self.scheduler.shutdown(wait=False)
+        self.pool.shutdown(wait=False)
+        self.pregen_pool.shutdown(wait=False)
 
-    def _tick(self) -> None:
-        now = datetime.utcnow()
-        due = list(self.schedules.find({"status": "pending", "scheduled_at": {"$lte": now}}).sort("scheduled_at", 1))
-        for sched in due:
+    def notify(self, when: datetime | None = None) -> None:
+        nxt = self._next_at
+        if when is not None:
+            when = when - timedelta(seconds=self.pregen_window_seconds)
+        if when is None or nxt is None or when < nxt:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
             try:
-                note = sched.get("note", "")
-                num = int(sched.get("num_questions", 5))
-                qtype = (sched.get("question_type") or "text").lower()
-                delay = max(5, min(60, int(sched.get("delay_seconds", 5))))
-                target = sched.get("target_chat_id")
-
-                questions = generate_questions(note, num)
-                if not questions:
-                    self.schedules.update_one({"_id": sched["_id"]}, {"$set": {"status": "failed"}})
-                    continue
-
-                letters = ["A", "B", "C", "D"]
-                for idx, q in enumerate(questions, start=1):
-                    time.sleep(delay)
-                    if qtype == "text":
-                        text = f"{idx}. {q['question']}\n"
-                        for i, c in enumerate(q["choices"]):
-                            prefix = letters[i] if i < len(letters) else str(i + 1)
-                            text += f"{prefix}. {c}\n"
-                        text += f"\nCorrect Answer: {letters[q['answer_index']]} - {q['choices'][q['answer_index']]}"
-                        explanation = (q.get("explanation") or "")
-                        if explanation:
-                            text += f"\nExplanation: {explanation[:195]}"
-                        self.bot.send_message(target, text)
-                    else:
-                        self.bot.send_poll(
-                            target,
-                            q["question"],
-                            q["choices"],
-                            type="quiz",
-                            correct_option_id=q["answer_index"],
-                            explanation=(q.get("explanation") or "")[:195],
-                        )
-
-                self.schedules.update_one({"_id": sched["_id"]}, {"$set": {"status": "sent"}})
+                self._tick()
+                self._pregen_tick()
+                timeout = self._seconds_until_next()
             except Exception:
-                self.schedules.update_one({"_id": sched["_id"]}, {"$set": {"status": "failed"}})
\ No newline at end of file
+                timeout = 5
+            self._wake.wait(timeout)
+
+    def _seconds_until_next(self) -> float:
+        with self._lock:
+            if self._dispatching >= self.concurrency:
+                # A finishing dispatch wakes us up
+                self._next_at = None
+                return self.max_idle_seconds
+        now = datetime.utcnow()
+        candidates = [self.repo.next_wakeup(self.owner)]
+        if self.pregen_window_seconds:
+            with self._lock:
+                pregen_full = self._pregenerating >= self.pregen_concurrency
+            if not pregen_full:
+                candidates.append(self.repo.next_pregen_at(now, self.pregen_window_seconds))
+        candidates = [c for c in candidates if c is not None]
+        nxt = min(candidates) if candidates else None
+        self._next_at = nxt
+        if nxt is None:
+            return self.max_idle_seconds
+        wait = (nxt - now).total_seconds()
+        return max(0.0, min(wait, float(self.max_idle_seconds)))
+
+    def _watch(self) -> None:
+        try:
+            pipeline = [{"$match": {"operationType": {"$in": ["insert", "replace"]}}}]
+            with self.repo.collection.watch(pipeline) as stream:
+                for change in stream:
+                    if self._stop.is_set():
+                        return
+                    doc = change.get("fullDocument") or {}
+                    self.notify(doc.get("scheduled_at"))
+        except PyMongoError:
+            # Standalone servers have no change streams; the idle re-check covers it
+            return
+
+    def _tick(self) -> None:
+        # Only claim what this replica can start on right away; the rest stays for other nodes
+        while True:
+            with self._lock:
+                if self._dispatching >= self.concurrency:
+                    return
+            sched = self.repo.claim_due(datetime.utcnow(), self.owner, self.lease_seconds)
+            if not sched:
+                return
+            with self._lock:
+                self._leased.add(sched["_id"])
+                self._dispatching += 1
+            self.pool.submit(self._dispatch, sched)
+
+    def _pregen_tick(self) -> None:
+        if not self.pregen_window_seconds:
+            return
+        while True:
+            with self._lock:
+                if self._pregenerating >= self.pregen_concurrency:
+                    return
+            now = datetime.utcnow()
+            horizon = now + timedelta(seconds=self.pregen_window_seconds)
+            sched = self.repo.claim_pregen(now, horizon, self.pregen_lease_seconds)
+            if not sched:
+                return
+            with self._lock:
+                self._pregenerating += 1
+            self.pregen_pool.submit(self._pregenerate, sched)
+
+    def _pregenerate(self, sched: Dict[str, Any]) -> None:
+        try:
+            questions = get_batcher().generate(
+                sched.get("note", ""), int(sched.get("num_questions", 5)), fresh=bool(sched.get("fresh"))
+            )
+            if questions:
+                self.repo.store_questions(sched["_id"], questions)
+            else:
+                self._retry_pregen(sched)
+        except Exception:
+            self._retry_pregen(sched)
+        finally:
+            with self._lock:
+                self._pregenerating -= 1
+            self._wake.set()
+
+    def _retry_pregen(self, sched: Dict[str, Any]) -> None:
+        # Back off exponentially; if the due time arrives first, dispatch generates inline
+        attempts = int(sched.get("pregen_attempts", 1))
+        backoff = min(30 * 2 ** (attempts - 1), 600)
+        self.repo.retry_pregen_at(sched["_id"], datetime.utcnow() + timedelta(seconds=backoff))
+
+    def _heartbeat(self) -> None:
+        with self._lock:
+            ids = list(self._leased)
+        self.repo.renew_leases(ids, self.owner, self.lease_seconds)
+
+    def _finish(self, schedule_id: Any, status: str) -> None:
+        with self._lock:
+            self._leased.discard(schedule_id)
+        self.repo.finish(schedule_id, self.owner, status)
+
+    def _dispatch(self, sched: Dict[str, Any]) -> None:
+        try:
+            note = sched.get("note", "")
+            num = int(sched.get("num_questions", 5))
+            qtype = (sched.get("question_type") or "text").lower()
+            delay = int(sched.get("delay_seconds", 5))
+            delay = 0 if delay <= 0 else max(5, min(60, delay))
+            target = sched.get("target_chat_id")
+
+            fresh = bool(sched.get("fresh"))
+            questions = sched.get("questions")
+            if not questions:
+                if self.streaming:
+                    questions = stream_questions(note, num, fresh=fresh)
+                else:
+                    questions = get_batcher().generate(note, num, fresh=fresh)
+
+            job = None
+            error: Exception | None = None
+            try:
+                for item in render_quiz(questions, qtype, bundle=self.bundle and delay == 0):
+                    if job is None:
+                        job = self.delivery.open(target, delay, on_done=self._on_delivered(sched["_id"]))
+                    self.delivery.feed(job, item)
+            except Exception as exc:
+                if job is None:
+                    raise
+                # A stream that breaks mid-quiz fails the schedule once delivery settles
+                error = exc
+            finally:
+                if job is not None:
+                    self.delivery.close(job, error)
+            if job is None:
+                self._finish(sched["_id"], "failed")
+        except Exception:
+            self._finish(sched["_id"], "failed")
+        finally:
+            with self._lock:
+                self._dispatching -= 1
+            self._wake.set()
+
+    def _on_delivered(self, schedule_id):
+        def done(job: QuizDelivery) -> None:
+            self._finish(schedule_id, "sent" if job.ok else "failed")
+
+        return done
@@ -7,8 +7,8 @@ from ..repositories.settings import SettingsRepository
 class SettingsService:
     def __init__(self, db: Database) -> None:
         self.db = db
-        self.repo = SettingsRepository(db)
         self.cfg = get_config()
+        self.repo = SettingsRepository(db, ttl_seconds=self.cfg.settings_cache_ttl_seconds)
 
     def get_bool(self, key: str, default: bool | None = None) -> bool:
         if default is None:
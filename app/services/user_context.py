@@ -0,0 +1,99 @@
+import threading
+from typing import Any, Dict, Optional
+from telebot.handler_backends import BaseMiddleware
+from ..repositories.users import UsersRepository
+
+
+class UserContext:
+    """The user document for one update, loaded at most once.
+
+    Writes are applied to the in-memory copy right away and sent to MongoDB as a
+    single update when the update finishes. Contexts created outside an update
+    (autoflush=True) write through immediately instead.
+    """
+
+    __slots__ = ("repo", "user_id", "autoflush", "_doc", "_set", "_inc")
+
+    def __init__(self, repo: UsersRepository, user_id: int, autoflush: bool = False) -> None:
+        self.repo = repo
+        self.user_id = user_id
+        self.autoflush = autoflush
+        self._doc: Optional[Dict[str, Any]] = None
+        self._set: Dict[str, Any] = {}
+        self._inc: Dict[str, int] = {}
+
+    @property
+    def doc(self) -> Dict[str, Any]:
+        if self._doc is None:
+            self._doc = self.repo.get(self.user_id) or {}
+        return self._doc
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.doc)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.doc.get("role") == "admin"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.doc.get(key, default)
+
+    def replace(self, doc: Dict[str, Any]) -> None:
+        self._doc = doc or {}
+
+    def set(self, key: str, value: Any) -> None:
+        self.doc[key] = value
+        self._set[key] = value
+        self._inc.pop(key, None)
+        if self.autoflush:
+            self.flush()
+
+    def inc(self, key: str, amount: int = 1) -> None:
+        self.doc[key] = int(self.doc.get(key, 0) or 0) + amount
+        if key in self._set:
+            self._set[key] = self.doc[key]
+        else:
+            self._inc[key] = self._inc.get(key, 0) + amount
+        if self.autoflush:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._set and not self._inc:
+            return
+        self.repo.apply(self.user_id, self._set, self._inc)
+        self._set = {}
+        self._inc = {}
+
+
+_local = threading.local()
+
+
+def user_context(repo: UsersRepository, user_id: int) -> UserContext:
+    ctx: Optional[UserContext] = getattr(_local, "ctx", None)
+    if ctx is not None and ctx.user_id == user_id:
+        return ctx
+    return UserContext(repo, user_id, autoflush=True)
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Binds a UserContext to the handler thread for the duration of one update."""
+
+    def __init__(self, repo: UsersRepository) -> None:
+        super().__init__()
+        self.repo = repo
+        self.update_types = ["message", "callback_query"]
+
+    def pre_process(self, message, data) -> None:
+        user = getattr(message, "from_user", None)
+        _local.ctx = UserContext(self.repo, user.id) if user else None
+
+    def post_process(self, message, data, exception) -> None:
+        ctx: Optional[UserContext] = getattr(_local, "ctx", None)
+        _local.ctx = None
+        if ctx is None:
+            return
+        try:
+            ctx.flush()
+        except Exception:
+            pass
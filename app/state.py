@@ -0,0 +1,118 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Generic, Optional, Type, TypeVar
+from pymongo.database import Database
+
+
+class FlowState:
+    """Base for conversation state; subclasses list their fields in __slots__."""
+
+    __slots__ = ()
+
+    def __init__(self, **fields: Any) -> None:
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, doc: Dict[str, Any]) -> "FlowState":
+        return cls(**{name: doc.get(name) for name in cls.__slots__})
+
+
+class NoteFlow(FlowState):
+    # Generate flow: note -> destination -> delay -> send now or schedule
+    __slots__ = ("stage", "note", "target_chat_id", "target_label", "delay_seconds")
+
+
+class PaymentFlow(FlowState):
+    __slots__ = ("method", "screenshot")
+
+
+S = TypeVar("S", bound=FlowState)
+
+
+class StateStore(ABC, Generic[S]):
+    """Per-user conversation state. Entries expire `ttl_seconds` after their last put()."""
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[S]:
+        ...
+
+    @abstractmethod
+    def put(self, user_id: int, state: S) -> None:
+        ...
+
+    @abstractmethod
+    def pop(self, user_id: int) -> None:
+        ...
+
+    def stage(self, user_id: int) -> Optional[str]:
+        state = self.get(user_id)
+        return getattr(state, "stage", None) if state is not None else None
+
+
+class MemoryStateStore(StateStore[S]):
+    """LRU of state objects bounded by `max_entries`; abandoned flows expire after the TTL."""
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 10000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple[S, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[S]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return entry[0]
+
+    def put(self, user_id: int, state: S) -> None:
+        with self._lock:
+            self._entries[user_id] = (state, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MongoStateStore(StateStore[S]):
+    """State shared by every replica; a TTL index on expires_at removes abandoned flows."""
+
+    def __init__(self, db: Database, collection: str, state_cls: Type[S], ttl_seconds: float = 3600) -> None:
+        self.collection = db[collection]
+        self.state_cls = state_cls
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, user_id: int) -> Optional[S]:
+        # The TTL monitor runs about once a minute, so check expiry here too
+        doc = self.collection.find_one({"_id": user_id, "expires_at": {"$gt": datetime.utcnow()}})
+        return self.state_cls.from_dict(doc) if doc else None
+
+    def put(self, user_id: int, state: S) -> None:
+        doc = state.to_dict()
+        doc["expires_at"] = datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+        self.collection.replace_one({"_id": user_id}, doc, upsert=True)
+
+    def pop(self, user_id: int) -> None:
+        self.collection.delete_one({"_id": user_id})
+
+
+def make_store(backend: str, db: Database, collection: str, state_cls: Type[S], ttl_seconds: float, max_entries: int) -> StateStore[S]:
+    if backend == "mongo":
+        return MongoStateStore(db, collection, state_cls, ttl_seconds)
+    return MemoryStateStore(ttl_seconds, max_entries)
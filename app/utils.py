@@ -1,8 +1,8 @@
 from telebot import TeleBot
-from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from typing import List
 from .config import get_config
 from .services.settings_service import SettingsService
+from .services.membership import is_member_of_all
 from .db import get_db
 
 
@@ -18,17 +18,4 @@ def is_subscribed(bot: TeleBot, user_id: int) -> bool:
     if not force:
         return True
     channels = ss.get_list_str("force_channels", default=get_config().force_channels)
-    for channel in channels:
-        try:
-            status = bot.get_chat_member(channel, user_id).status
-            if status not in ["member", "administrator", "creator"]:
-                return False
-        except Exception:
-            return False
-    return True
-
-
-def home_keyboard() -> InlineKeyboardMarkup:
-    kb = InlineKeyboardMarkup()
-    kb.add(InlineKeyboardButton("🔙home", callback_data="home"))
-    return kb
\ No newline at end of file
+    return is_member_of_all(bot, user_id, channels)
@@ -0,0 +1,135 @@
+import hmac
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+from telebot import TeleBot
+from telebot.types import Update
+
+
+MAX_BODY_BYTES = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer:
+    """Receives Telegram updates over HTTP and runs them on a bounded worker pool.
+
+    The request thread only checks the secret token and enqueues the raw body, so
+    Telegram gets its 200 right away. When the queue is full the server answers
+    503 and Telegram redelivers the update later.
+
+    Preconditions: `secret` must be set (it is what Telegram sends in
+    X-Telegram-Bot-Api-Secret-Token), and `bot` must be built with threaded=False
+    so handlers run inline on this server's workers and the queue bound holds.
+    """
+
+    def __init__(
+        self,
+        bot: TeleBot,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        path: str = "/",
+        secret: str = "",
+        workers: int = 8,
+        queue_size: int = 1000,
+    ) -> None:
+        if not secret:
+            raise ValueError("webhook mode needs a secret token")
+        if bot.threaded:
+            raise ValueError("webhook mode needs a bot built with threaded=False")
+        self.bot = bot
+        self.path = path or "/"
+        self.secret = secret
+        self.workers = max(1, workers)
+        self.queue: "queue.Queue[bytes | None]" = queue.Queue(maxsize=queue_size)
+        self.accepted = 0
+        self.rejected = 0
+        self._threads: list[threading.Thread] = []
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def server_address(self) -> Tuple[str, int]:
+        return self._httpd.server_address[:2]
+
+    def start(self) -> None:
+        self._start_workers()
+        threading.Thread(target=self._httpd.serve_forever, name="webhook-http", daemon=True).start()
+
+    def serve_forever(self) -> None:
+        self._start_workers()
+        self._httpd.serve_forever()
+
+    def shutdown(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for _ in self._threads:
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queued": self.queue.qsize(), "accepted": self.accepted, "rejected": self.rejected}
+
+    def offer(self, body: bytes) -> bool:
+        try:
+            self.queue.put_nowait(body)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def _start_workers(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"webhook-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _work(self) -> None:
+        while True:
+            body = self.queue.get()
+            if body is None:
+                return
+            try:
+                update = Update.de_json(json.loads(body))
+                self.bot.process_new_updates([update])
+            except Exception:
+                logger.exception("Webhook update failed")
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                token = self.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+                if not hmac.compare_digest(token.encode(), server.secret.encode()):
+                    self._reply(401)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length <= 0 or length > MAX_BODY_BYTES:
+                    self._reply(413 if length else 400)
+                    return
+                body = self.rfile.read(length)
+                self._reply(200 if server.offer(body) else 503)
+
+            def do_GET(self) -> None:
+                # Load balancer health check
+                self._reply(200)
+
+            def _reply(self, code: int) -> None:
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
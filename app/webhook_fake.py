@@ -0,0 +1,95 @@
+"""Local fake of Telegram's webhook sender, for exercising WebhookServer offline.
+
+    python -m app.webhook_fake              # in-process server with a recording bot
+    python -m app.webhook_fake URL SECRET   # post to an already running server
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from typing import Any, Dict, List
+
+from telebot import TeleBot
+from telebot.types import Update
+
+from .webhook import WebhookServer
+
+
+def fake_update(update_id: int, user_id: int, text: str = "/start") -> Dict[str, Any]:
+    """A private-chat text message update, shaped like the ones Telegram posts."""
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "from": user,
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+            "text": text,
+        },
+    }
+
+
+def send_update(url: str, secret: str, update: Dict[str, Any], timeout: float = 5.0) -> int:
+    """POST one update the way Telegram does and return the HTTP status."""
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(update).encode(),
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+def send_updates(url: str, secret: str, count: int = 100, users: int = 10) -> Counter:
+    """Send `count` updates spread over `users` chats; returns a Counter of statuses."""
+    statuses: Counter = Counter()
+    for i in range(1, count + 1):
+        statuses[send_update(url, secret, fake_update(i, 1000 + i % users))] += 1
+    return statuses
+
+
+class RecordingBot(TeleBot):
+    """Offline bot that records the update ids it is asked to process."""
+
+    def __init__(self) -> None:
+        super().__init__("0:fake", threaded=False)
+        self.seen: List[int] = []
+        self._lock = threading.Lock()
+
+    def process_new_updates(self, updates: List[Update]) -> None:
+        with self._lock:
+            self.seen.extend(u.update_id for u in updates)
+
+
+def run_local(count: int = 100, users: int = 10, secret: str = "local-secret") -> Dict[str, Any]:
+    """Start a WebhookServer on a free port, replay fake updates into it and report."""
+    bot = RecordingBot()
+    server = WebhookServer(bot, host="127.0.0.1", port=0, path="/telegram", secret=secret, workers=4)
+    server.start()
+    host, port = server.server_address
+    url = f"http://{host}:{port}/telegram"
+    try:
+        statuses = send_updates(url, secret, count, users)
+        statuses[f"wrong secret -> {send_update(url, 'wrong', fake_update(0, 1))}"] += 1
+        deadline = time.monotonic() + 5
+        while len(bot.seen) < statuses[200] and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        server.shutdown()
+    return {"statuses": dict(statuses), "processed": len(bot.seen), "stats": server.stats()}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) == 3:
+        print(dict(send_updates(sys.argv[1], sys.argv[2])))
+    else:
+        print(run_local())